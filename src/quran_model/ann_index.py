@@ -0,0 +1,185 @@
+import os
+import logging
+from typing import Optional, Tuple
+import numpy as np
+from quran_model.dense_retrieval import l2_normalize, top_k_indices
+
+try:
+    import hnswlib
+except ImportError:  # hnswlib is optional, IVF-flat and exact search still work
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+class HNSWIndex:
+    """HNSW graph index (hnswlib) over L2-normalized embeddings.
+
+    ``ef`` is the recall/latency knob: larger values visit more graph nodes.
+    """
+    kind = 'hnsw'
+    suffix = '.hnsw'
+
+    def __init__(self, index, ef: int = 64):
+        self.index = index
+        self.ef = ef
+        self.index.set_ef(ef)
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, M: int = 32, ef_construction: int = 200, ef: int = 64) -> 'HNSWIndex':
+        if hnswlib is None:
+            raise ImportError("hnswlib is required for HNSW indexes (pip install hnswlib)")
+        embeddings = l2_normalize(embeddings)
+        index = hnswlib.Index(space='ip', dim=embeddings.shape[1])
+        index.init_index(max_elements=embeddings.shape[0], M=M, ef_construction=ef_construction)
+        index.add_items(embeddings, np.arange(embeddings.shape[0]))
+        return cls(index, ef=ef)
+
+    @classmethod
+    def load(cls, path: str, dim: int, ef: int = 64) -> 'HNSWIndex':
+        if hnswlib is None:
+            raise ImportError("hnswlib is required for HNSW indexes (pip install hnswlib)")
+        index = hnswlib.Index(space='ip', dim=dim)
+        index.load_index(path)
+        return cls(index, ef=ef)
+
+    def save(self, path: str):
+        self.index.save_index(path)
+
+    def search_batch(self, queries: np.ndarray, top_k: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        if top_k > self.ef:
+            # The graph search cannot return more neighbours than ef candidates
+            return None
+        labels, distances = self.index.knn_query(queries, k=top_k)
+        # hnswlib's 'ip' distance is 1 - inner product
+        return labels.astype(np.int64), (1.0 - distances).astype(np.float32)
+
+class IVFFlatIndex:
+    """Inverted-file index: k-means centroids plus exact scoring inside the probed lists.
+
+    ``nprobe`` is the recall/latency knob: the number of nearest lists scanned per query.
+    """
+    kind = 'ivf'
+    suffix = '.ivf.npz'
+
+    def __init__(self, embeddings: np.ndarray, centroids: np.ndarray, list_ids: np.ndarray, list_offsets: np.ndarray, nprobe: int = 8):
+        self.embeddings = embeddings
+        self.centroids = centroids
+        self.list_ids = list_ids
+        self.list_offsets = list_offsets
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, nlist: Optional[int] = None, iterations: int = 20, nprobe: int = 8, seed: int = 42) -> 'IVFFlatIndex':
+        embeddings = l2_normalize(embeddings)
+        n = embeddings.shape[0]
+        nlist = min(nlist or max(1, int(np.sqrt(n))), n)
+
+        # Spherical k-means: centroids are re-normalized after every update
+        rng = np.random.default_rng(seed)
+        centroids = embeddings[rng.choice(n, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = cls._assign(embeddings, centroids)
+            for c in range(nlist):
+                members = embeddings[assignments == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = l2_normalize(centroids)
+
+        assignments = cls._assign(embeddings, centroids)
+        list_ids = np.argsort(assignments, kind='stable').astype(np.int64)
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))]).astype(np.int64)
+        return cls(embeddings, centroids, list_ids, list_offsets, nprobe=nprobe)
+
+    @staticmethod
+    def _assign(embeddings: np.ndarray, centroids: np.ndarray, chunk_size: int = 4096) -> np.ndarray:
+        assignments = np.empty(embeddings.shape[0], dtype=np.int64)
+        for start in range(0, embeddings.shape[0], chunk_size):
+            chunk = embeddings[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+        return assignments
+
+    @classmethod
+    def load(cls, path: str, embeddings: np.ndarray, nprobe: int = 8) -> 'IVFFlatIndex':
+        with np.load(path) as data:
+            return cls(l2_normalize(embeddings), data['centroids'], data['list_ids'], data['list_offsets'], nprobe=nprobe)
+
+    def save(self, path: str):
+        # Write through a file handle so numpy does not append a second .npz suffix
+        with open(path, 'wb') as f:
+            np.savez(f, centroids=self.centroids, list_ids=self.list_ids, list_offsets=self.list_offsets)
+
+    def search_batch(self, queries: np.ndarray, top_k: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        nprobe = min(self.nprobe, self.centroids.shape[0])
+        probe_lists = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+
+        all_indices = np.empty((queries.shape[0], top_k), dtype=np.int64)
+        all_scores = np.empty((queries.shape[0], top_k), dtype=np.float32)
+        for row, (query, lists) in enumerate(zip(queries, probe_lists)):
+            candidates = np.concatenate([self.list_ids[self.list_offsets[c]:self.list_offsets[c + 1]] for c in lists])
+            if len(candidates) < top_k:
+                # Probed lists are too small to fill top_k, let the caller fall back to exact search
+                return None
+            scores = self.embeddings[candidates] @ query
+            best = top_k_indices(scores, top_k)
+            all_indices[row] = candidates[best]
+            all_scores[row] = scores[best]
+        return all_indices, all_scores
+
+ANN_INDEX_TYPES = {
+    HNSWIndex.kind: HNSWIndex,
+    IVFFlatIndex.kind: IVFFlatIndex,
+}
+
+def ann_index_path(embedding_path: str, kind: str) -> str:
+    """Location of the ANN index built next to an embedding artifact"""
+    base, _ = os.path.splitext(embedding_path)
+    return base + ANN_INDEX_TYPES[kind].suffix
+
+def build_ann_index(kind: str, embeddings, embedding_path: str, **params) -> str:
+    """Build an ANN index for an embedding matrix and save it next to the embedding file"""
+    if kind not in ANN_INDEX_TYPES:
+        raise ValueError(f"Unknown ANN index type: {kind}")
+    index = ANN_INDEX_TYPES[kind].build(l2_normalize(embeddings), **params)
+    path = ann_index_path(embedding_path, kind)
+    index.save(path)
+    logger.info(f"Saved {kind} index to {path}")
+    return path
+
+def load_ann_index(config: Optional[dict], embeddings: np.ndarray, embedding_path: str):
+    """Load the ANN index described by an ENCODER_MODELS 'ann_index' entry.
+
+    Returns None (exact search) when no index is configured, the index file
+    has not been built, or the optional backend is not installed.
+    """
+    if not config:
+        return None
+    kind = config.get('type')
+    if kind not in ANN_INDEX_TYPES:
+        logger.warning(f"Unknown ANN index type {kind}, using exact search")
+        return None
+
+    path = ann_index_path(embedding_path, kind)
+    if not os.path.exists(path):
+        logger.warning(f"ANN index not found at {path}, using exact search")
+        return None
+
+    try:
+        if kind == HNSWIndex.kind:
+            index = HNSWIndex.load(path, dim=embeddings.shape[1], ef=config.get('ef', 64))
+        else:
+            index = IVFFlatIndex.load(path, embeddings, nprobe=config.get('nprobe', 8))
+        logger.info(f"Loaded {kind} index from {path}")
+        return index
+    except Exception as e:
+        logger.warning(f"Failed to load ANN index {path}, using exact search: {e}")
+        return None
+
+if __name__ == "__main__":
+    import sys
+    from quran_model.embedding_store import load_embeddings
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 3 or sys.argv[1] not in ANN_INDEX_TYPES:
+        print(f"Usage: python -m quran_model.ann_index <{'|'.join(ANN_INDEX_TYPES)}> <embedding_file>")
+        sys.exit(1)
+    kind, embedding_file = sys.argv[1], sys.argv[2]
+    build_ann_index(kind, load_embeddings(embedding_file), embedding_file)
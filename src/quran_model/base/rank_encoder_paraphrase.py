@@ -1,14 +1,18 @@
 import pandas as pd
 from typing import List, Dict
 from quran_model.text_normalization import normalisasi_teks
+from quran_model.caching import cached_pair_scores
 
 class RankEncoderParaphrase:
-    def __init__(self, bi_encoder, cross_encoder, embedding_korpus, daftar_string_terjemahan_quran):
+    def __init__(self, bi_encoder, cross_encoder, embedding_korpus, daftar_string_terjemahan_quran, cross_encoder_name='', score_cache=None):
         self.bi_encoder = bi_encoder
         self.cross_encoder = cross_encoder
         self.embedding_korpus = embedding_korpus
         self.daftar_string_terjemahan_quran = daftar_string_terjemahan_quran
         self.korpus = [str(item) for item in daftar_string_terjemahan_quran]
+        self.cross_encoder_name = cross_encoder_name
+        # Optional LRUCache of scores keyed on (cross_encoder_name, normalized query, corpus_id)
+        self.score_cache = score_cache
 
     def rank(self, query: str, candidates: List[dict]) -> List[dict]:
         """Rank the candidates using cross-encoder with paraphrase support"""
@@ -17,10 +21,10 @@ class RankEncoderParaphrase:
             normalized_query = normalisasi_teks(query)
             
             # Create cross-encoder pairs
-            pairs = [[normalized_query, self.korpus[hit['corpus_id']]] for hit in candidates]
+            pairs = [(normalized_query, hit['corpus_id']) for hit in candidates]
             
-            # Get cross-encoder scores
-            cross_scores = self.cross_encoder.predict(pairs)
+            # Get cross-encoder scores, predicting only pairs not scored before
+            cross_scores = cached_pair_scores(self.score_cache, self.cross_encoder, self.cross_encoder_name, pairs, self.korpus)
 
             # Add scores to candidates
             for idx, score in enumerate(cross_scores):
@@ -32,49 +32,66 @@ class SearchEncoderParaphrase:
                 return 1.0 / i
         return 0.0
 
+    def _hits_to_results(self, hits_per_paraphrase: List[List[Dict]], top_k: int) -> List[Dict]:
+        all_results = []
+        seen_docs = set()
+        
+        for hits in hits_per_paraphrase:
+            # Add unique results
+            for hit in hits:
+                if hit['corpus_id'] not in seen_docs:
+                    # Calculate MAP and MRR scores
+                    map_score = self.calculate_map_score([1.0 if i == hit['corpus_id'] else 0.0 for i in range(len(self.korpus))])
+                    mrr_score = self.calculate_mrr_score([1.0 if i == hit['corpus_id'] else 0.0 for i in range(len(self.korpus))])
+                    
+                    all_results.append({
+                        'corpus_id': hit['corpus_id'],
+                        'score': float(hit['score']),
+                        'text': self.korpus[hit['corpus_id']],
+                        'map_score': map_score,
+                        'mrr_score': mrr_score,
+                        'final_score': (map_score + mrr_score) / 2
+                    })
+                    seen_docs.add(hit['corpus_id'])
+        
+        # Sort by final score
+        all_results = sorted(all_results, key=lambda x: x['final_score'], reverse=True)
+        return all_results[:top_k]
+
     def search(self, query: str, top_k: int = 20) -> List[Dict]:
         try:
             # Generate paraphrases (you can implement your own paraphrase generation here)
             paraphrases = [query]  # For now, just use the original query
             
-            all_results = []
-            seen_docs = set()
+            # Normalize paraphrases
+            normalized_queries = [normalisasi_teks(paraphrase) for paraphrase in paraphrases]
             
-            for paraphrase in paraphrases:
-                # Normalize paraphrase
-                normalized_query = normalisasi_teks(paraphrase)
-                
-                # Create query embedding
-                query_embedding = self.bi_encoder.encode(normalized_query, convert_to_tensor=True)
-                
-                # Perform semantic search
-                hits = util.semantic_search(query_embedding, self.embedding_korpus, top_k=top_k)[0]
-                
-                # Add unique results
-                for hit in hits:
-                    if hit['corpus_id'] not in seen_docs:
-                        # Calculate MAP and MRR scores
-                        map_score = self.calculate_map_score([1.0 if i == hit['corpus_id'] else 0.0 for i in range(len(self.korpus))])
-                        mrr_score = self.calculate_mrr_score([1.0 if i == hit['corpus_id'] else 0.0 for i in range(len(self.korpus))])
-                        
-                        all_results.append({
-                            'corpus_id': hit['corpus_id'],
-                            'score': float(hit['score']),
-                            'text': self.korpus[hit['corpus_id']],
-                            'map_score': map_score,
-                            'mrr_score': mrr_score,
-                            'final_score': (map_score + mrr_score) / 2
-                        })
-                        seen_docs.add(hit['corpus_id'])
+            # Create query embeddings
+            query_embeddings = self.bi_encoder.encode(normalized_queries, convert_to_tensor=True)
             
-            # Sort by final score
-            all_results = sorted(all_results, key=lambda x: x['final_score'], reverse=True)
-            return all_results[:top_k]
+            # Perform semantic search
+            hits = util.semantic_search(query_embeddings, self.embedding_korpus, top_k=top_k)
+            
+            return self._hits_to_results(hits, top_k)
 
         except Exception as e:
             print(f"Error in search: {str(e)}")
             return []
 
+    def search_batch(self, queries: List[str], top_k: int = 20) -> List[List[Dict]]:
+        """Search many queries with one batched encode and one semantic_search call"""
+        if not queries:
+            return []
+        try:
+            normalized_queries = [normalisasi_teks(query) for query in queries]
+            query_embeddings = self.bi_encoder.encode(normalized_queries, convert_to_tensor=True)
+            hits_per_query = util.semantic_search(query_embeddings, self.embedding_korpus, top_k=top_k)
+            return [self._hits_to_results([hits], top_k) for hits in hits_per_query]
+
+        except Exception as e:
+            print(f"Error in batch search: {str(e)}")
+            return [[] for _ in queries]
+
 def cari_dengan_pengkode_silang_parafrasa(daftar_parafrasa):
 
     hasil_semua = []
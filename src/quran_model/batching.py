@@ -0,0 +1,243 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from queue import Empty, Queue
+from typing import Any, Callable, List, Sequence
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_CLOSE = object()  # queue sentinel that stops the batching thread
+
+class MicroBatcher:
+    """Merges work items submitted by concurrent callers into batched calls.
+
+    A background thread collects items until ``max_batch_size`` is reached
+    or ``max_wait_ms`` has passed since the first item arrived, runs
+    ``batch_fn`` once on all of them and hands every caller back its own
+    slice of the results. The thread is started lazily on first use, so an
+    instance can be created before the process forks. close() stops the
+    thread once the queued work is done, dropping its reference to batch_fn
+    (and the model behind it); callers still holding the batcher afterwards
+    run their items directly, unbatched.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], Sequence[Any]], max_batch_size: int = 64, max_wait_ms: float = 5.0, name: str = 'batcher'):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, items: List[Any]) -> Future:
+        """Queue items for the next batch; the future resolves to their results in order"""
+        future = Future()
+        if not items:
+            future.set_result([])
+            return future
+        # Under the lock so nothing can be queued behind the close sentinel
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+                self._queue.put((list(items), future))
+        if closed:
+            self._run_batch([(list(items), future)])
+        return future
+
+    def run(self, items: List[Any]) -> List[Any]:
+        """Blocking submit"""
+        return self.submit(items).result()
+
+    def close(self):
+        """Stop the batching thread after it has run everything already queued"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(_CLOSE)
+
+    def _collect(self) -> List:
+        """The next batch of requests; the last element is _CLOSE when close() was called"""
+        requests = [self._queue.get()]
+        if requests[0] is _CLOSE:
+            return requests
+        size = len(requests[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except Empty:
+                break
+            requests.append(request)
+            if request is _CLOSE:
+                break
+            size += len(request[0])
+        return requests
+
+    def _run(self):
+        while True:
+            requests = self._collect()
+            closing = requests[-1] is _CLOSE
+            if closing:
+                requests.pop()
+            if requests:
+                self._run_batch(requests)
+            if closing:
+                return  # the sentinel is the last item ever queued
+
+    def _run_batch(self, requests: List):
+        batch = [item for items, _ in requests for item in items]
+        try:
+            results = self.batch_fn(batch)
+        except Exception as e:
+            logger.error(f"{self.name}: batch of {len(batch)} failed: {e}")
+            for _, future in requests:
+                future.set_exception(e)
+            return
+
+        # Scatter the results back to each caller
+        offset = 0
+        for items, future in requests:
+            future.set_result(results[offset:offset + len(items)])
+            offset += len(items)
+
+class BatchingCrossEncoder:
+    """CrossEncoder front end whose predict calls are merged across concurrent requests.
+
+    Only plain predicts are batched; calls with other options (activation,
+    softmax, ...) go straight to the wrapped model.
+    """
+
+    def __init__(self, cross_encoder, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.cross_encoder = cross_encoder
+        self.batcher = MicroBatcher(
+            lambda pairs: cross_encoder.predict(pairs, batch_size=len(pairs)),
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            name='cross-encoder-batcher'
+        )
+
+    def predict(self, pairs, batch_size: int = None, **kwargs):
+        if kwargs:
+            if batch_size is not None:
+                kwargs['batch_size'] = batch_size
+            return self.cross_encoder.predict(pairs, **kwargs)
+        return np.asarray(self.batcher.run(list(pairs)))
+
+    def close(self):
+        self.batcher.close()
+
+    def __getattr__(self, name):
+        # Everything else (tokenizer, config, ...) comes from the wrapped model
+        return getattr(self.cross_encoder, name)
+
+class BatchingBiEncoder:
+    """SentenceTransformer front end that merges concurrent query encodes into one forward pass.
+
+    Only plain numpy encodes are batched; calls with other options go
+    straight to the wrapped model.
+    """
+
+    def __init__(self, bi_encoder, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.bi_encoder = bi_encoder
+        self.batcher = MicroBatcher(
+            lambda texts: bi_encoder.encode(texts, convert_to_numpy=True, batch_size=len(texts)),
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            name='bi-encoder-batcher'
+        )
+
+    def encode(self, sentences, convert_to_numpy: bool = True, **kwargs):
+        if kwargs or not convert_to_numpy:
+            return self.bi_encoder.encode(sentences, convert_to_numpy=convert_to_numpy, **kwargs)
+        if isinstance(sentences, str):
+            return self.batcher.run([sentences])[0]
+        return np.stack(self.batcher.run(list(sentences)))
+
+    def close(self):
+        self.batcher.close()
+
+    def __getattr__(self, name):
+        return getattr(self.bi_encoder, name)
+
+class LengthBucketedCrossEncoder:
+    """CrossEncoder front end that sorts pairs by token length and predicts them in buckets.
+
+    Each bucket is padded only to its own longest pair (capped at the model's
+    max_length) instead of the longest pair of the whole call; scores are
+    returned in the original pair order. Token counts come from the wrapped
+    model's token_lengths when it has one (PretokenizedCrossEncoder already
+    holds every verse's ids); otherwise they are cached per text, since the
+    verse side repeats across calls.
+    """
+
+    def __init__(self, cross_encoder, bucket_size: int = 32, min_bucket_size: int = 4, length_slack: float = 1.25, max_cached_lengths: int = 100000):
+        self.cross_encoder = cross_encoder
+        self.bucket_size = bucket_size
+        self.min_bucket_size = min_bucket_size
+        self.length_slack = length_slack
+        self.max_cached_lengths = max_cached_lengths
+        self.tokenizer = getattr(cross_encoder, 'tokenizer', None)
+        self.max_length = getattr(cross_encoder, 'max_length', None) or getattr(self.tokenizer, 'model_max_length', 512)
+        self._lengths = {}
+        self._token_lengths = getattr(cross_encoder, 'token_lengths', None)
+
+    def _text_lengths(self, texts: List[str]) -> List[int]:
+        if self._token_lengths is not None:
+            return self._token_lengths(texts)
+        known = self._lengths
+        missing = list({text for text in texts if text not in known})
+        if missing:
+            if len(known) + len(missing) > self.max_cached_lengths:
+                known = self._lengths = {}
+            for text, ids in zip(missing, self.tokenizer(missing, add_special_tokens=False)['input_ids']):
+                known[text] = len(ids)
+        return [known[text] for text in texts]
+
+    def pair_lengths(self, pairs) -> np.ndarray:
+        """Padded length of every pair: both sides plus [CLS]/[SEP]/[SEP], truncated at max_length"""
+        query_lengths = self._text_lengths([pair[0] for pair in pairs])
+        document_lengths = self._text_lengths([pair[1] for pair in pairs])
+        return np.minimum(np.add(query_lengths, document_lengths) + 3, self.max_length)
+
+    def buckets(self, lengths: np.ndarray) -> List[np.ndarray]:
+        """Pair positions grouped by length; a bucket closes when it is full or the length grows past the slack"""
+        buckets, current = [], []
+        for i in np.argsort(lengths, kind='stable'):
+            if current and (
+                len(current) >= self.bucket_size or
+                (len(current) >= self.min_bucket_size and lengths[i] > lengths[current[0]] * self.length_slack)
+            ):
+                buckets.append(np.asarray(current))
+                current = []
+            current.append(i)
+        if current:
+            buckets.append(np.asarray(current))
+        return buckets
+
+    def predict(self, pairs, batch_size: int = None, **kwargs):
+        pairs = [list(pair) for pair in pairs]
+        if self.tokenizer is None or len(pairs) <= self.min_bucket_size:
+            return self.cross_encoder.predict(pairs, **kwargs)
+
+        scores = None
+        for bucket in self.buckets(self.pair_lengths(pairs)):
+            bucket_scores = np.asarray(self.cross_encoder.predict([pairs[i] for i in bucket], batch_size=len(bucket), **kwargs))
+            if scores is None:
+                scores = np.empty((len(pairs),) + bucket_scores.shape[1:], dtype=bucket_scores.dtype)
+            scores[bucket] = bucket_scores
+        return scores
+
+    def __getattr__(self, name):
+        return getattr(self.cross_encoder, name)
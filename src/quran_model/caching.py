@@ -0,0 +1,118 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+
+_MISSING = object()
+
+class LRUCache:
+    """Thread-safe bounded LRU cache with an optional per-entry TTL and hit/miss counters"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self._data = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value, or compute and cache it.
+
+        compute runs outside the lock, so concurrent misses on the same key may
+        both compute; the last result wins.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches predicate, returning how many were removed"""
+        with self._lock:
+            stale = [key for key in self._data if predicate(key)]
+            for key in stale:
+                del self._data[key]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+def cached_query_embeddings(cache: Optional[LRUCache], encoder_name: str, keys: List[str], encode: Callable[[List[int]], Any]) -> List[Any]:
+    """Query vectors for keys, encoding only the cache misses.
+
+    encode receives the positions of the missing keys and returns their
+    vectors in the same order, so misses are still encoded in one batch.
+    """
+    if cache is None:
+        return list(encode(list(range(len(keys)))))
+
+    vectors = [cache.get((encoder_name, key), _MISSING) for key in keys]
+    missing = [i for i, vector in enumerate(vectors) if vector is _MISSING]
+    if missing:
+        for i, vector in zip(missing, encode(missing)):
+            vector = np.asarray(vector, dtype=np.float32)
+            vector.setflags(write=False)  # shared between requests
+            cache.set((encoder_name, keys[i]), vector)
+            vectors[i] = vector
+    return vectors
+
+def cached_pair_scores(cache: Optional[LRUCache], cross_encoder, cross_encoder_name: str, pairs: List[Tuple[str, int]], korpus: List[str]) -> List[float]:
+    """Cross-encoder scores for (normalized query, corpus_id) pairs.
+
+    Pairs already scored by this cross-encoder come from the cache; only
+    the rest are sent to predict, in a single call.
+    """
+    if cache is None:
+        scores = cross_encoder.predict([[query, korpus[corpus_id]] for query, corpus_id in pairs]) if pairs else []
+        return [float(score) for score in scores]
+
+    keys = [(cross_encoder_name, query, corpus_id) for query, corpus_id in pairs]
+    scores = [cache.get(key, _MISSING) for key in keys]
+    missing = [i for i, score in enumerate(scores) if score is _MISSING]
+    if missing:
+        predicted = cross_encoder.predict([[pairs[i][0], korpus[pairs[i][1]]] for i in missing])
+        for i, score in zip(missing, predicted):
+            scores[i] = float(score)
+            cache.set(keys[i], scores[i])
+    return scores
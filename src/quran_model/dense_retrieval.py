@@ -0,0 +1,112 @@
+from typing import Tuple
+import numpy as np
+
+def to_float32_matrix(embeddings) -> np.ndarray:
+    """Convert numpy arrays, lists of floats or torch tensors into a float32 matrix"""
+    if hasattr(embeddings, 'detach'):
+        # torch.Tensor (possibly on GPU)
+        embeddings = embeddings.detach().cpu().numpy()
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return matrix
+
+def l2_normalize(matrix) -> np.ndarray:
+    """Return a contiguous float32 matrix with unit-length rows.
+
+    Input that is already contiguous, float32 and normalized is returned
+    as-is, so a normalized matrix can be shared without being copied.
+    """
+    matrix = to_float32_matrix(matrix)
+    # einsum avoids materializing matrix * matrix, which matters for memory-mapped input
+    norms = np.sqrt(np.einsum('ij,ij->i', matrix, matrix))[:, None]
+    if matrix.flags['C_CONTIGUOUS'] and np.allclose(norms, 1.0, atol=1e-4):
+        return matrix
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k highest scores, sorted by descending score"""
+    top_k = min(top_k, scores.shape[0])
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if top_k < scores.shape[0]:
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+def top_k_indices_batch(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Row-wise top_k indices of a (queries x corpus) score matrix, sorted per row"""
+    top_k = min(top_k, scores.shape[1])
+    if top_k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if top_k < scores.shape[1]:
+        candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+class DenseIndex:
+    """Cosine-similarity index over a corpus embedding matrix.
+
+    The corpus is normalized once at construction so each query costs one
+    matrix-vector product plus an argpartition over top_k. An optional
+    approximate index (see ann_index.py) is consulted first; exact search is
+    the fallback whenever it cannot answer or ``exact=True`` is requested.
+    """
+
+    def __init__(self, embeddings, ann=None):
+        if isinstance(embeddings, DenseIndex):
+            ann = ann if ann is not None else embeddings.ann
+            embeddings = embeddings.embeddings
+        self.embeddings = l2_normalize(embeddings)
+        self.ann = ann
+
+    def __len__(self) -> int:
+        return self.embeddings.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.embeddings.shape[1]
+
+    def scores(self, query_embedding) -> np.ndarray:
+        """Cosine similarity between one query vector and every corpus row"""
+        query = l2_normalize(query_embedding)[0]
+        return self.embeddings @ query
+
+    def _search_ann(self, queries: np.ndarray, top_k: int, exact: bool):
+        if self.ann is None or exact or top_k >= len(self):
+            return None
+        return self.ann.search_batch(queries, top_k)
+
+    def search(self, query_embedding, top_k: int = 5, exact: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, scores) of the top_k most similar corpus rows"""
+        query = l2_normalize(query_embedding)
+        approximate = self._search_ann(query, top_k, exact)
+        if approximate is not None:
+            indices, scores = approximate
+            return indices[0], scores[0]
+
+        cos_scores = self.embeddings @ query[0]
+        indices = top_k_indices(cos_scores, top_k)
+        return indices, cos_scores[indices]
+
+    def search_batch(self, query_embeddings, top_k: int = 5, exact: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, scores), each of shape (queries, top_k), using one matrix-matrix product"""
+        queries = l2_normalize(query_embeddings)
+        approximate = self._search_ann(queries, top_k, exact)
+        if approximate is not None:
+            return approximate
+
+        cos_scores = queries @ self.embeddings.T
+        indices = top_k_indices_batch(cos_scores, top_k)
+        return indices, np.take_along_axis(cos_scores, indices, axis=1)
+
+def as_index(embeddings):
+    """Wrap raw embeddings in a DenseIndex, passing through objects that already are an index"""
+    if hasattr(embeddings, 'search_batch'):
+        return embeddings
+    return DenseIndex(embeddings)
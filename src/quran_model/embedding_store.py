@@ -0,0 +1,107 @@
+import os
+import json
+import pickle
+import hashlib
+import logging
+from datetime import datetime, timezone
+import numpy as np
+from quran_model.dense_retrieval import l2_normalize
+
+logger = logging.getLogger(__name__)
+
+def npy_path(embedding_path: str) -> str:
+    base, _ = os.path.splitext(embedding_path)
+    return base + '.npy'
+
+def legacy_pickle_path(embedding_path: str) -> str:
+    base, _ = os.path.splitext(embedding_path)
+    return base + '.pkl'
+
+def resolve_embedding_path(embedding_path: str) -> str:
+    """The artifact actually backing an embedding file: the .npy if present, else the legacy pickle"""
+    for path in (npy_path(embedding_path), legacy_pickle_path(embedding_path)):
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No embedding artifact found for {embedding_path}")
+
+def save_embeddings(embeddings, embedding_path: str) -> str:
+    """Write embeddings as an L2-normalized float32 .npy file"""
+    path = npy_path(embedding_path)
+    np.save(path, l2_normalize(embeddings))
+    logger.info(f"Saved embeddings to {path}")
+    return path
+
+def load_embeddings(embedding_path: str, mmap: bool = True) -> np.ndarray:
+    """Load an embedding artifact as a normalized float32 matrix.
+
+    .npy artifacts are opened read-only with mmap_mode='r', so workers share
+    the pages through the OS page cache instead of each holding a private
+    copy. Legacy pickles are still read, at the cost of a full deserialize.
+    """
+    path = resolve_embedding_path(embedding_path)
+    if path.endswith('.npy'):
+        return l2_normalize(np.load(path, mmap_mode='r' if mmap else None))
+
+    logger.warning(f"Loading legacy pickle {path}, regenerate embeddings to get a memory-mapped .npy")
+    with open(path, 'rb') as f:
+        return l2_normalize(pickle.load(f))
+
+MANIFEST_FILE = 'embedding_manifest.json'
+MANIFEST_VERSION = 1
+
+class EmbeddingManifestError(ValueError):
+    """Raised when an embedding artifact does not match its manifest or the current corpus"""
+
+def corpus_checksum(texts) -> str:
+    """sha256 over the corpus texts the embeddings were computed from"""
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+def load_manifest(manifest_path: str) -> dict:
+    if not os.path.exists(manifest_path):
+        return {'version': MANIFEST_VERSION, 'encoders': {}}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def update_manifest(manifest_path: str, model_name: str, embedding_file: str, embeddings, checksum: str) -> dict:
+    """Record one encoder's artifact in the manifest, keeping the other entries"""
+    manifest = load_manifest(manifest_path)
+    embeddings = np.asarray(embeddings)
+    entry = {
+        'model': model_name,
+        'file': os.path.basename(embedding_file),
+        'rows': int(embeddings.shape[0]),
+        'dims': int(embeddings.shape[1]),
+        'dtype': 'float32',  # save_embeddings always writes float32
+        'corpus_checksum': checksum,
+        'build_time': datetime.now(timezone.utc).isoformat(),
+    }
+    manifest['version'] = MANIFEST_VERSION
+    manifest.setdefault('encoders', {})[model_name] = entry
+
+    # Write atomically so a concurrent reader never sees a half-written manifest
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return entry
+
+def validate_manifest_entry(entry: dict, checksum: str):
+    """Reject an artifact built from a different corpus, before any vectors are loaded"""
+    if entry.get('corpus_checksum') != checksum:
+        raise EmbeddingManifestError(
+            f"Embeddings for {entry.get('model')} were built from a different corpus "
+            f"(manifest {entry.get('corpus_checksum', '')[:12]}, current {checksum[:12]})"
+        )
+
+def validate_embeddings(embeddings: np.ndarray, entry: dict, rows: int):
+    """Check loaded vectors against the manifest entry and the current corpus size"""
+    if embeddings.shape[0] != rows:
+        raise EmbeddingManifestError(f"Embeddings have {embeddings.shape[0]} rows but the corpus has {rows} verses")
+    if entry and (embeddings.shape[0] != entry['rows'] or embeddings.shape[1] != entry['dims']):
+        raise EmbeddingManifestError(
+            f"Embeddings shape {embeddings.shape} does not match manifest ({entry['rows']}, {entry['dims']})"
+        )
@@ -0,0 +1,68 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when a BoundedExecutor already has max_pending tasks running or queued"""
+
+class BoundedExecutor:
+    """Thread pool that refuses new work once ``max_pending`` tasks are running or queued.
+
+    Blocking work (torch inference, HTTP calls, file I/O) runs here instead of
+    on the event loop. The pool is created lazily on first submit, and again
+    in a forked child, whose copy of the parent's pool has no threads.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, name: str = 'executor'):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.name = name
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._lock = Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+            self._pid = os.getpid()
+        return self._executor
+
+    def _release(self, _future: Future):
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise ExecutorSaturatedError(f"{self.name}: {self._pending} tasks pending")
+            self._pending += 1
+            try:
+                future = self._get_executor().submit(fn, *args, **kwargs)
+            except Exception:
+                self._pending -= 1
+                raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn on the pool and await its result without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'pending': self._pending,
+        }
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
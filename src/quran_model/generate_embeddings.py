@@ -1,11 +1,12 @@
 import os
-import pickle
 import numpy as np
 from sentence_transformers import SentenceTransformer
 from openai import OpenAI
 import logging
 from pathlib import Path
 from quran_model.utility import muat_jsonl
+from quran_model.ann_index import build_ann_index
+from quran_model.embedding_store import MANIFEST_FILE, corpus_checksum, save_embeddings, update_manifest
 import torch
 
 # Setup logging
@@ -26,10 +27,8 @@ def generate_transformer_embeddings(model_name, texts, output_file):
     elif isinstance(embeddings, list):
         embeddings = np.array(embeddings)
     
-    logger.info(f"Saving embeddings to {output_file}")
-    with open(output_file, 'wb') as f:
-        # Use protocol=4 for better compatibility
-        pickle.dump(embeddings, f, protocol=4)
+    # Normalized float32 .npy, memory-mapped by the server
+    save_embeddings(embeddings, str(output_file))
     
     return embeddings
 
@@ -61,10 +60,8 @@ def generate_openai_embeddings(texts, output_file):
     # Convert to numpy array
     embeddings = np.array(embeddings_list, dtype=np.float32)
     
-    logger.info(f"Saving embeddings to {output_file}")
-    with open(output_file, 'wb') as f:
-        # Use protocol=4 for better compatibility
-        pickle.dump(embeddings, f, protocol=4)
+    # Normalized float32 .npy, memory-mapped by the server
+    save_embeddings(embeddings, str(output_file))
     
     return embeddings
 
@@ -78,14 +75,21 @@ def main():
         logger.info(f"Loading translations from {translation_file}")
         translations = muat_jsonl(str(translation_file))
         texts = [str(item) for item in translations]
+        checksum = corpus_checksum(texts)
+        manifest_path = str(current_dir / MANIFEST_FILE)
         
         # Model configurations
         models = {
-            'firqaaa/indo-sentence-bert-base': 'embedding_korpus_1.pkl',
-            'indobenchmark/indobert-base-p1': 'embedding_korpus_2.pkl',
-            'msmarco-distilbert-base-tas-b': 'embedding_korpus_3.pkl',
-            'aubmindlab/bert-base-arabert': 'embedding_korpus_4.pkl',
-            'text-embedding-ada-002': 'embedding_korpus_5.pkl'
+            'firqaaa/indo-sentence-bert-base': 'embedding_korpus_1.npy',
+            'indobenchmark/indobert-base-p1': 'embedding_korpus_2.npy',
+            'msmarco-distilbert-base-tas-b': 'embedding_korpus_3.npy',
+            'aubmindlab/bert-base-arabert': 'embedding_korpus_4.npy',
+            'text-embedding-ada-002': 'embedding_korpus_5.npy'
+        }
+        
+        # ANN indexes built next to the embeddings (keep in sync with 'ann_index' in serve_quran_model.ENCODER_MODELS)
+        ann_indexes = {
+            'text-embedding-ada-002': 'hnsw'
         }
         
         # Generate embeddings for transformer models and OpenAI
@@ -94,10 +98,14 @@ def main():
             try:
                 logger.info(f"\nProcessing model: {model_name}")
                 if model_name == 'text-embedding-ada-002':
-                    generate_openai_embeddings(texts, output_path)
+                    embeddings = generate_openai_embeddings(texts, output_path)
                 else:
-                    generate_transformer_embeddings(model_name, texts, output_path)
+                    embeddings = generate_transformer_embeddings(model_name, texts, output_path)
+                update_manifest(manifest_path, model_name, str(output_path), embeddings, checksum)
                 logger.info(f"Successfully generated embeddings for {model_name}")
+                
+                if model_name in ann_indexes:
+                    build_ann_index(ann_indexes[model_name], embeddings, str(output_path))
             except Exception as e:
                 logger.error(f"Error generating embeddings for {model_name}: {e}")
         
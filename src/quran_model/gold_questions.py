@@ -0,0 +1,152 @@
+import os
+import json
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from quran_model.minhash_lsh import MinHashLSH
+
+logger = logging.getLogger(__name__)
+
+def normalize_text(text: str) -> str:
+    # Convert to lowercase
+    text = text.lower()
+    # Remove punctuation
+    text = ''.join(c for c in text if c.isalnum() or c.isspace())
+    # Normalize whitespace
+    text = ' '.join(text.split())
+    return text
+
+def _load_jsonl(file_path: str) -> List[Dict]:
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except Exception as e:
+        logger.warning(f"Error loading {file_path}: {e}")
+        return []
+
+def load_question_variants(quran_data_dir: str) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """Indonesian translations and paraphrases of the Task-A questions, keyed on qid"""
+    translations_data = {}
+    paraphrases_data = {}
+    for dataset in ['dev', 'test', 'train']:
+        for item in _load_jsonl(os.path.join(quran_data_dir, f'terjemahan_pertanyaan_claude_{dataset}_id.jsonl')):
+            if 'qid' in item and 'query_id' in item:
+                translations_data.setdefault(str(item['qid']), []).append(item['query_id'])
+    for dataset in ['dev', 'test', 'train']:
+        for item in _load_jsonl(os.path.join(quran_data_dir, f'parafrasa_pertanyaan_gpt_{dataset}_id.jsonl')):
+            if 'qid' in item and 'query_versions' in item:
+                paraphrases_data.setdefault(str(item['qid']), []).extend(item['query_versions'])
+    return translations_data, paraphrases_data
+
+class GoldQuestionStore:
+    """Task-A questions with their translations and paraphrases, indexed for Jaccard lookup.
+
+    Every translation/paraphrase is normalized once into a set of token ids,
+    and an inverted index maps each token id to the texts containing it, so a
+    query only visits texts that share at least one token with it.
+
+    With index='minhash' (or 'minhash-exact') the texts are additionally put
+    in a MinHashLSH index and queries only score its candidates, by estimated
+    or exact Jaccard respectively; this keeps lookups sublinear when the bank
+    grows to tens of thousands of texts, at the cost of possibly missing
+    low-similarity matches.
+    """
+
+    def __init__(self, gold_questions: Dict[str, str], translations: Dict[str, List[str]], paraphrases: Dict[str, List[str]],
+                 index: str = 'exact', num_perm: int = 128, bands: int = 32):
+        if index not in ('exact', 'minhash', 'minhash-exact'):
+            raise ValueError(f"Unknown related-questions index: {index}")
+        self.gold_questions = {str(qid): question for qid, question in gold_questions.items()}
+        self.translations = translations
+        self.paraphrases = paraphrases
+        self.vocabulary: Dict[str, int] = {}
+        self.text_qids: List[str] = []
+        self.text_sizes: List[int] = []
+        self.postings: Dict[int, List[int]] = {}
+        self.index = index
+        self.lsh: Optional[MinHashLSH] = MinHashLSH(num_perm=num_perm, bands=bands) if index != 'exact' else None
+
+        token_sets = []
+        for qid in self.gold_questions:
+            for text in translations.get(qid, []) + paraphrases.get(qid, []):
+                token_sets.append(self._add_text(qid, text))
+        if self.lsh is not None:
+            self.lsh.add_many(token_sets)
+
+    def _add_text(self, qid: str, text: str) -> set:
+        tokens = set(normalize_text(text).split())
+        text_id = len(self.text_qids)
+        self.text_qids.append(qid)
+        self.text_sizes.append(len(tokens))
+        for token in tokens:
+            token_id = self.vocabulary.setdefault(token, len(self.vocabulary))
+            self.postings.setdefault(token_id, []).append(text_id)
+        return tokens
+
+    def __len__(self) -> int:
+        return len(self.gold_questions)
+
+    def similar_questions(self, query: str) -> List[Tuple[float, str, str]]:
+        """(best Jaccard similarity over the question's texts, qid, question) for every question sharing a token with the query"""
+        query_tokens = set(normalize_text(query).split())
+        best: Dict[str, float] = {}
+        for text_id, similarity in self._text_similarities(query_tokens):
+            qid = self.text_qids[text_id]
+            if similarity > best.get(qid, 0.0):
+                best[qid] = similarity
+        return [(similarity, qid, self.gold_questions[qid]) for qid, similarity in best.items()]
+
+    def _text_similarities(self, query_tokens: set) -> List[Tuple[int, float]]:
+        if self.lsh is not None:
+            return self.lsh.query(query_tokens, exact=self.index == 'minhash-exact')
+        shared = Counter()
+        for token in query_tokens:
+            token_id = self.vocabulary.get(token)
+            if token_id is not None:
+                shared.update(self.postings[token_id])
+        return [
+            (text_id, overlap / (len(query_tokens) + self.text_sizes[text_id] - overlap))
+            for text_id, overlap in shared.items()
+        ]
+
+    def relevancy(self, query: str, top_k: int = 5) -> Tuple[Dict[str, float], List[Dict[str, Any]]]:
+        relevancy_scores = {"high": 0.0, "medium": 0.0, "low": 0.0}
+        related_questions = []
+
+        if not self.gold_questions:
+            relevancy_scores["medium"] = 1.0
+            return relevancy_scores, related_questions
+
+        # Sort by similarity score
+        similarities = self.similar_questions(query)
+        similarities.sort(reverse=True)
+        top = similarities[:top_k]
+
+        # Calculate relevancy metrics
+        if top:
+            max_sim = top[0][0]
+            if max_sim >= 0.6:
+                relevancy_scores["high"] = 0.7
+                relevancy_scores["medium"] = 0.2
+                relevancy_scores["low"] = 0.1
+            elif max_sim >= 0.3:
+                relevancy_scores["high"] = 0.3
+                relevancy_scores["medium"] = 0.5
+                relevancy_scores["low"] = 0.2
+            else:
+                relevancy_scores["high"] = 0.1
+                relevancy_scores["medium"] = 0.3
+                relevancy_scores["low"] = 0.6
+
+        # Add related questions with translations and paraphrases
+        for sim, qid, question in top:
+            related_questions.append({
+                "qid": qid,
+                "question": question,
+                "similarity": float(sim),
+                "translations": self.translations.get(qid, []),
+                "paraphrases": self.paraphrases.get(qid, []),
+                "arabic_question": question  # Keep the Arabic question for display
+            })
+
+        return relevancy_scores, related_questions
@@ -0,0 +1,88 @@
+import zlib
+from typing import Dict, Iterable, List, Set, Tuple
+import numpy as np
+
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_MAX_HASH = np.uint64(2**32 - 1)
+
+def token_hashes(tokens: Iterable[str]) -> np.ndarray:
+    """Process-independent 32-bit hashes of the tokens (unlike hash(), which is salted per process)"""
+    return np.fromiter((zlib.crc32(token.encode('utf-8')) for token in tokens), dtype=np.uint64)
+
+class MinHashLSH:
+    """MinHash signatures with LSH banding for approximate Jaccard search over token sets.
+
+    Each text gets num_perm min-hashes; texts whose signatures agree on all
+    rows of at least one of the ``bands`` bands become candidates. The
+    fraction of agreeing min-hashes estimates Jaccard similarity with a
+    standard error of about sqrt(J * (1 - J) / num_perm), i.e. at most 0.044
+    for the default 128 permutations. With exact=True candidates are scored
+    by exact Jaccard instead, so only recall is approximate.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.RandomState(seed)
+        # a * h + b stays below 2**64 for 32-bit a, b and h
+        self.a = rng.randint(1, 2**32 - 1, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self.b = rng.randint(0, 2**32 - 1, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self.signatures = np.zeros((0, num_perm), dtype=np.uint64)
+        self.token_sets: List[Set[str]] = []
+        self.buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self.token_sets)
+
+    def signature(self, tokens: Set[str]) -> np.ndarray:
+        hashes = token_hashes(tokens)
+        if hashes.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        permuted = (self.a[:, None] * hashes[None, :] + self.b[:, None]) % _PRIME
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add_many(self, token_sets: List[Set[str]]) -> List[int]:
+        """Index token sets, returning their ids (positions in insertion order)"""
+        start = len(self.token_sets)
+        signatures = np.stack([self.signature(tokens) for tokens in token_sets]) if token_sets else \
+            np.zeros((0, self.num_perm), dtype=np.uint64)
+        for offset, (tokens, signature) in enumerate(zip(token_sets, signatures)):
+            if not tokens:
+                continue  # an empty set is similar to nothing
+            for band, key in enumerate(self._band_keys(signature)):
+                self.buckets[band].setdefault(key, []).append(start + offset)
+        self.signatures = np.concatenate([self.signatures, signatures])
+        self.token_sets.extend(set(tokens) for tokens in token_sets)
+        return list(range(start, len(self.token_sets)))
+
+    def candidates(self, tokens: Set[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(candidate ids, query signature)"""
+        signature = self.signature(tokens)
+        if not tokens:
+            return np.zeros(0, dtype=np.int64), signature
+        found = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            found.update(self.buckets[band].get(key, ()))
+        return np.fromiter(found, dtype=np.int64, count=len(found)), signature
+
+    def query(self, tokens: Set[str], exact: bool = False) -> List[Tuple[int, float]]:
+        """(text id, similarity) for every LSH candidate with non-zero similarity"""
+        candidate_ids, signature = self.candidates(tokens)
+        if candidate_ids.size == 0:
+            return []
+        if exact:
+            scored = []
+            for text_id in candidate_ids.tolist():
+                text_tokens = self.token_sets[text_id]
+                overlap = len(tokens & text_tokens)
+                scored.append((text_id, overlap / (len(tokens) + len(text_tokens) - overlap)))
+        else:
+            estimates = (self.signatures[candidate_ids] == signature).mean(axis=1)
+            scored = list(zip(candidate_ids.tolist(), estimates.tolist()))
+        return [(text_id, similarity) for text_id, similarity in scored if similarity > 0]
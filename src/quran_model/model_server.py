@@ -0,0 +1,297 @@
+import logging
+import time
+import itertools
+import threading
+import multiprocessing as mp
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from queue import Empty
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class SharedEmbeddings:
+    """A float32 embedding matrix in a multiprocessing.shared_memory segment.
+
+    The front end creates the segment once; worker processes attach to it by
+    name and get a read-only view, so N workers share one copy of the vectors.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, shape: Tuple[int, int], owner: bool):
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.owner = owner
+        self.array = np.ndarray(self.shape, dtype=np.float32, buffer=shm.buf)
+        if not owner:
+            self.array.setflags(write=False)
+
+    @classmethod
+    def create(cls, embeddings) -> 'SharedEmbeddings':
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        shm = shared_memory.SharedMemory(create=True, size=max(embeddings.nbytes, 1))
+        shared = cls(shm, embeddings.shape, owner=True)
+        shared.array[:] = embeddings
+        return shared
+
+    @classmethod
+    def attach(cls, spec: Dict[str, Any]) -> 'SharedEmbeddings':
+        # Spawned workers share the front end's resource tracker, so attaching
+        # does not make the segment outlive (or die with) the worker
+        shm = shared_memory.SharedMemory(name=spec['name'])
+        return cls(shm, spec['shape'], owner=False)
+
+    def spec(self) -> Dict[str, Any]:
+        return {'name': self.shm.name, 'shape': self.shape}
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+def _build_search_encoder(spec: Dict[str, Any], records: List[dict], korpus: List[str]):
+    """Load one encoder's models inside a worker, searching over the shared embeddings"""
+    from quran_model.ann_index import load_ann_index
+    from quran_model.caching import LRUCache
+    from quran_model.dense_retrieval import DenseIndex
+    from quran_model.onnx_backend import load_bi_encoder, load_cross_encoder
+    from quran_model.rank_encoder_translation import RankEncoderTranslation
+    from quran_model.search_encoder_translation import SearchEncoderTranslation
+
+    shared = SharedEmbeddings.attach(spec['embeddings'])
+    index = DenseIndex(shared.array, ann=load_ann_index(spec.get('ann_index'), shared.array, spec['embedding_path']))
+    bi_encoder = load_bi_encoder(spec['name'], spec.get('backend', 'torch'))
+    cross_encoder = None
+    if spec.get('cross_encoder_name'):
+        try:
+            cross_encoder = load_cross_encoder(spec['cross_encoder_name'], spec.get('backend', 'torch'))
+        except Exception as e:
+            logger.warning(f"Failed to load cross-encoder {spec['cross_encoder_name']}: {e}")
+
+    model = SearchEncoderTranslation(
+        bi_encoder=bi_encoder,
+        cross_encoder=cross_encoder,
+        embedding_korpus=index,
+        korpus=korpus,
+        encoder_name=spec['name'],
+        query_cache=LRUCache(maxsize=spec.get('query_cache_size', 4096))
+    )
+    if cross_encoder is not None:
+        model.rank_encoder = RankEncoderTranslation(
+            bi_encoder=bi_encoder,
+            cross_encoder=cross_encoder,
+            embedding_korpus=index.embeddings,
+            daftar_string_terjemahan_quran=records,
+            cross_encoder_name=spec['cross_encoder_name'],
+            score_cache=LRUCache(maxsize=spec.get('score_cache_size', 100000))
+        )
+    return model, shared
+
+def _worker_main(worker_id: int, specs: List[Dict[str, Any]], records: List[dict], jobs, replies):
+    """Worker process loop: pin the assigned encoders, then answer (job_id, encoder, method, args) jobs"""
+    logging.basicConfig(level=logging.INFO)
+    korpus = [str(item) for item in records]
+    models, segments = {}, []
+    for spec in specs:
+        try:
+            models[spec['name']], shared = _build_search_encoder(spec, records, korpus)
+            segments.append(shared)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} failed to load {spec['name']}: {e}")
+    replies.put(('ready', worker_id, sorted(models)))
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, encoder_name, method, args = job
+        try:
+            if encoder_name not in models:
+                raise RuntimeError(f"Encoder {encoder_name} is not loaded in worker {worker_id}")
+            replies.put(('result', job_id, getattr(models[encoder_name], method)(*args)))
+        except Exception as e:
+            replies.put(('error', job_id, str(e)))
+
+    for shared in segments:
+        shared.close()
+
+class RemoteSearchEncoder:
+    """Stands in for a SearchEncoderTranslation whose models live in a worker process"""
+
+    def __init__(self, server: 'ModelServer', encoder_name: str):
+        self.server = server
+        self.encoder_name = encoder_name
+
+    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        return self.server.call(self.encoder_name, 'search', query, top_k)
+
+    def search_batch(self, queries: List[str], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        return self.server.call(self.encoder_name, 'search_batch', list(queries), top_k)
+
+class ModelServer:
+    """Inference worker processes that each pin a subset of the transformer encoders.
+
+    Corpus embeddings are copied once into shared memory and attached
+    read-only by the workers; the models themselves are loaded only in the
+    worker that owns the encoder. Jobs go out over one queue per worker and
+    replies come back on a shared queue, resolved by a dispatcher thread.
+    Workers are spawned, not forked, so they never inherit torch thread state.
+    """
+
+    def __init__(self, num_workers: int, timeout: float = 60.0):
+        self.num_workers = num_workers
+        self.timeout = timeout
+        self.ctx = mp.get_context('spawn')
+        self.processes = []
+        self.job_queues = []
+        self.replies = None
+        self.segments: Dict[str, SharedEmbeddings] = {}
+        self.assignment: Dict[str, int] = {}
+        self.ready: Dict[int, List[str]] = {}
+        self._futures: Dict[int, Future] = {}
+        self._futures_lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._dispatcher = None
+        self._dead_workers = set()
+
+    def start(self, encoders: Dict[str, Dict[str, Any]], records: List[dict]):
+        """Start the workers; encoders maps encoder name -> {'embeddings', 'embedding_path', 'ann_index', 'cross_encoder_name', 'backend'}"""
+        specs_per_worker = [[] for _ in range(self.num_workers)]
+        for i, (name, info) in enumerate(encoders.items()):
+            shared = SharedEmbeddings.create(info['embeddings'])
+            self.segments[name] = shared
+            worker_id = i % self.num_workers
+            self.assignment[name] = worker_id
+            specs_per_worker[worker_id].append({
+                'name': name,
+                'embeddings': shared.spec(),
+                'embedding_path': info['embedding_path'],
+                'ann_index': info.get('ann_index'),
+                'cross_encoder_name': info.get('cross_encoder_name'),
+                'backend': info.get('backend', 'torch'),
+            })
+            logger.info(f"Encoder {name} -> worker {worker_id}, embeddings {shared.shape} in shared memory {shared.shm.name}")
+
+        self.replies = self.ctx.Queue()
+        for worker_id, specs in enumerate(specs_per_worker):
+            jobs = self.ctx.Queue()
+            process = self.ctx.Process(
+                target=_worker_main,
+                args=(worker_id, specs, records, jobs, self.replies),
+                name=f"inference-worker-{worker_id}",
+                daemon=True
+            )
+            process.start()
+            self.job_queues.append(jobs)
+            self.processes.append(process)
+
+        self._dispatcher = threading.Thread(target=self._dispatch, name='model-server-dispatcher', daemon=True)
+        self._dispatcher.start()
+
+    def _fail_dead_workers(self):
+        """Fail the pending jobs of worker processes that have exited, instead of letting callers time out"""
+        for worker_id, process in enumerate(self.processes):
+            if worker_id in self._dead_workers or process.is_alive():
+                continue
+            self._dead_workers.add(worker_id)
+            logger.error(f"Inference worker {worker_id} (pid {process.pid}) exited with code {process.exitcode}")
+            with self._futures_lock:
+                lost = [job_id for job_id, future in self._futures.items() if future.worker_id == worker_id]
+                futures = [self._futures.pop(job_id) for job_id in lost]
+            for future in futures:
+                future.set_exception(RuntimeError(f"Inference worker {worker_id} exited with code {process.exitcode}"))
+
+    def _dispatch(self):
+        last_check = time.monotonic()
+        while True:
+            # Check worker liveness at least every 0.5s, even while replies keep arriving
+            if time.monotonic() - last_check >= 0.5:
+                self._fail_dead_workers()
+                last_check = time.monotonic()
+            try:
+                kind, key, payload = self.replies.get(timeout=0.5)
+            except Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            if kind == 'stop':
+                break
+            if kind == 'ready':
+                self.ready[key] = payload
+                logger.info(f"Inference worker {key} ready with {payload}")
+                for name, worker_id in self.assignment.items():
+                    if worker_id == key and name not in payload:
+                        logger.warning(f"Inference worker {key} could not load {name}, serving it in-process")
+                continue
+            with self._futures_lock:
+                future = self._futures.pop(key, None)
+            if future is None:
+                continue  # caller already timed out
+            if kind == 'result':
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+
+    def serves(self, encoder_name: str) -> bool:
+        """Whether an encoder is served by its worker: assigned, alive, and not missing from the worker's ready report.
+
+        Until the worker reports, its jobs simply queue up behind the loading.
+        """
+        worker_id = self.assignment.get(encoder_name)
+        if worker_id is None or not self.processes[worker_id].is_alive():
+            return False
+        ready = self.ready.get(worker_id)
+        return ready is None or encoder_name in ready
+
+    def encoder(self, encoder_name: str) -> RemoteSearchEncoder:
+        return RemoteSearchEncoder(self, encoder_name)
+
+    def submit(self, encoder_name: str, method: str, *args) -> Future:
+        worker_id = self.assignment[encoder_name]
+        if not self.processes[worker_id].is_alive():
+            raise RuntimeError(f"Inference worker {worker_id} for {encoder_name} is not running")
+        job_id = next(self._job_ids)
+        future = Future()
+        future.job_id = job_id
+        future.worker_id = worker_id
+        with self._futures_lock:
+            # A worker found dead by the dispatcher will not fail futures registered after that
+            if worker_id in self._dead_workers:
+                raise RuntimeError(f"Inference worker {worker_id} for {encoder_name} is not running")
+            self._futures[job_id] = future
+        self.job_queues[worker_id].put((job_id, encoder_name, method, args))
+        return future
+
+    def call(self, encoder_name: str, method: str, *args) -> Any:
+        future = self.submit(encoder_name, method, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        finally:
+            with self._futures_lock:
+                self._futures.pop(future.job_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': [
+                {'pid': process.pid, 'alive': process.is_alive(), 'encoders': self.ready.get(worker_id)}
+                for worker_id, process in enumerate(self.processes)
+            ],
+            'pending_jobs': len(self._futures),
+        }
+
+    def shutdown(self, timeout: float = 5.0):
+        for jobs in self.job_queues:
+            jobs.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        if self.replies is not None:
+            self.replies.put(('stop', None, None))
+        for shared in self.segments.values():
+            shared.close()
+        self.segments.clear()
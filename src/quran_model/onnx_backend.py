@@ -0,0 +1,299 @@
+import os
+import sys
+import json
+import logging
+from typing import Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# pip install onnx onnxruntime
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+ONNX_CACHE_DIR = os.getenv('ONNX_CACHE_DIR', os.path.join(current_dir, 'onnx_cache'))
+ONNX_QUANTIZE = os.getenv('ONNX_QUANTIZE', '1') not in ('0', 'false', 'False')
+ONNX_OPSET = 14
+
+def onnx_model_dir(model_name: str, kind: str) -> str:
+    return os.path.join(ONNX_CACHE_DIR, kind, model_name.replace('/', '__'))
+
+def _graph_path(model_dir: str, quantize: bool) -> str:
+    return os.path.join(model_dir, 'model.int8.onnx' if quantize else 'model.onnx')
+
+def _create_session(path: str):
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    threads = int(os.getenv('ONNX_THREADS', '0'))
+    if threads > 0:
+        options.intra_op_num_threads = threads
+    return ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+def _feeds(session, encoded) -> Dict[str, np.ndarray]:
+    """Tokenizer output restricted to the inputs the graph declares, as int64"""
+    names = {graph_input.name for graph_input in session.get_inputs()}
+    return {name: np.asarray(encoded[name], dtype=np.int64) for name in names if name in encoded}
+
+def _export(module, dummy, input_names: List[str], output_name: str, model_dir: str, quantize: bool) -> str:
+    """Export a torch module to model.onnx and, optionally, a dynamically INT8-quantized copy"""
+    import torch
+
+    os.makedirs(model_dir, exist_ok=True)
+    fp32_path = _graph_path(model_dir, False)
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes[output_name] = {0: 'batch'}
+    module.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            module,
+            tuple(dummy[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=[output_name],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET,
+            do_constant_folding=True
+        )
+    if not quantize:
+        return fp32_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    int8_path = _graph_path(model_dir, True)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+def _save_meta(model_dir: str, meta: dict):
+    with open(os.path.join(model_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+def _load_meta(model_dir: str) -> Optional[dict]:
+    path = os.path.join(model_dir, 'meta.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+class OnnxBiEncoder:
+    """SentenceTransformer stand-in running the exported sentence-embedding graph on onnxruntime.
+
+    The graph covers the whole SentenceTransformer pipeline (transformer,
+    pooling, dense/normalize layers), so only tokenization happens here.
+    """
+
+    def __init__(self, session, tokenizer, max_seq_length: int, name: str = '', nbytes: int = 0):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        self.name = name
+        self.nbytes = nbytes
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True, normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+        if not sentences:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # Sort by length so every batch pads to a similar size, as SentenceTransformer does
+        order = np.argsort([-len(sentence) for sentence in sentences], kind='stable')
+        embeddings = [None] * len(sentences)
+        for start in range(0, len(sentences), batch_size):
+            batch = [sentences[i] for i in order[start:start + batch_size]]
+            encoded = self.tokenizer(batch, padding=True, truncation='longest_first', max_length=self.max_seq_length, return_tensors='np')
+            output = self.session.run(None, _feeds(self.session, encoded))[0]
+            for i, row in zip(order[start:start + batch_size], output):
+                embeddings[i] = row
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings[0] if single else embeddings
+
+class OnnxCrossEncoder:
+    """CrossEncoder stand-in running the exported classification graph on onnxruntime"""
+
+    def __init__(self, session, tokenizer, max_length: int, num_labels: int, name: str = '', nbytes: int = 0):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.num_labels = num_labels
+        self.name = name
+        self.nbytes = nbytes
+
+    def predict(self, sentences, batch_size: int = 32, apply_softmax: bool = False, **kwargs) -> np.ndarray:
+        pairs = [list(pair) for pair in sentences]
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        logits = []
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            encoded = self.tokenizer(
+                [pair[0] for pair in batch], [pair[1] for pair in batch],
+                padding=True, truncation='longest_first', max_length=self.max_length, return_tensors='np'
+            )
+            logits.append(self.session.run(None, _feeds(self.session, encoded))[0])
+        logits = np.concatenate(logits).astype(np.float32)
+
+        # Same default activation as CrossEncoder: sigmoid for a single label
+        if self.num_labels == 1:
+            return 1.0 / (1.0 + np.exp(-logits[:, 0]))
+        if apply_softmax:
+            logits = np.exp(logits - logits.max(axis=1, keepdims=True))
+            return logits / logits.sum(axis=1, keepdims=True)
+        return logits
+
+def export_bi_encoder(model_name: str, model=None, quantize: bool = ONNX_QUANTIZE) -> str:
+    """Export a SentenceTransformer (and its tokenizer) into the ONNX cache"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = model if model is not None else SentenceTransformer(model_name, device='cpu')
+    tokenizer = model.tokenizer
+    dummy = tokenizer(['contoh kalimat pertanyaan'], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in dummy]
+
+    class SentenceEmbedding(torch.nn.Module):
+        def __init__(self, sentence_transformer):
+            super().__init__()
+            self.sentence_transformer = sentence_transformer
+
+        def forward(self, *inputs):
+            return self.sentence_transformer(dict(zip(input_names, inputs)))['sentence_embedding']
+
+    model_dir = onnx_model_dir(model_name, 'bi_encoder')
+    path = _export(SentenceEmbedding(model), dummy, input_names, 'sentence_embedding', model_dir, quantize)
+    tokenizer.save_pretrained(model_dir)
+    _save_meta(model_dir, {'model': model_name, 'max_length': model.max_seq_length, 'quantized': quantize})
+    logger.info(f"Exported {model_name} to {path}")
+    return path
+
+def export_cross_encoder(model_name: str, model=None, quantize: bool = ONNX_QUANTIZE) -> str:
+    """Export a CrossEncoder's classification model (and its tokenizer) into the ONNX cache"""
+    import torch
+    from sentence_transformers import CrossEncoder
+
+    model = model if model is not None else CrossEncoder(model_name, device='cpu')
+    tokenizer = model.tokenizer
+    dummy = tokenizer(['contoh pertanyaan'], ['contoh ayat'], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in dummy]
+
+    class Logits(torch.nn.Module):
+        def __init__(self, classifier):
+            super().__init__()
+            self.classifier = classifier
+
+        def forward(self, *inputs):
+            return self.classifier(**dict(zip(input_names, inputs)), return_dict=True).logits
+
+    model_dir = onnx_model_dir(model_name, 'cross_encoder')
+    path = _export(Logits(model.model), dummy, input_names, 'logits', model_dir, quantize)
+    tokenizer.save_pretrained(model_dir)
+    _save_meta(model_dir, {
+        'model': model_name,
+        'max_length': model.max_length or tokenizer.model_max_length,
+        'num_labels': model.config.num_labels,
+        'quantized': quantize
+    })
+    logger.info(f"Exported {model_name} to {path}")
+    return path
+
+def _load_cached(model_name: str, kind: str, quantize: bool):
+    model_dir = onnx_model_dir(model_name, kind)
+    meta = _load_meta(model_dir)
+    path = _graph_path(model_dir, quantize)
+    if meta is None or not os.path.exists(path):
+        return None, None, None, 0
+    from transformers import AutoTokenizer
+    return _create_session(path), AutoTokenizer.from_pretrained(model_dir), meta, os.path.getsize(path)
+
+def load_onnx_bi_encoder(model_name: str, quantize: bool = ONNX_QUANTIZE) -> OnnxBiEncoder:
+    """Open a bi-encoder from the ONNX cache, exporting it on first use"""
+    if ort is None:
+        raise ImportError("onnxruntime is not installed")
+    session, tokenizer, meta, nbytes = _load_cached(model_name, 'bi_encoder', quantize)
+    if session is None:
+        export_bi_encoder(model_name, quantize=quantize)
+        session, tokenizer, meta, nbytes = _load_cached(model_name, 'bi_encoder', quantize)
+    return OnnxBiEncoder(session, tokenizer, meta['max_length'], name=model_name, nbytes=nbytes)
+
+def load_onnx_cross_encoder(model_name: str, quantize: bool = ONNX_QUANTIZE) -> OnnxCrossEncoder:
+    """Open a cross-encoder from the ONNX cache, exporting it on first use"""
+    if ort is None:
+        raise ImportError("onnxruntime is not installed")
+    session, tokenizer, meta, nbytes = _load_cached(model_name, 'cross_encoder', quantize)
+    if session is None:
+        export_cross_encoder(model_name, quantize=quantize)
+        session, tokenizer, meta, nbytes = _load_cached(model_name, 'cross_encoder', quantize)
+    return OnnxCrossEncoder(session, tokenizer, meta['max_length'], meta['num_labels'], name=model_name, nbytes=nbytes)
+
+def load_bi_encoder(model_name: str, backend: str = 'torch'):
+    """SentenceTransformer, or its ONNX Runtime stand-in when backend is 'onnx' (falling back to torch)"""
+    if backend == 'onnx':
+        try:
+            return load_onnx_bi_encoder(model_name)
+        except Exception as e:
+            logger.warning(f"ONNX backend unavailable for {model_name}, using torch: {e}")
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+def load_cross_encoder(model_name: str, backend: str = 'torch'):
+    """CrossEncoder, or its ONNX Runtime stand-in when backend is 'onnx' (falling back to torch)"""
+    if backend == 'onnx':
+        try:
+            return load_onnx_cross_encoder(model_name)
+        except Exception as e:
+            logger.warning(f"ONNX backend unavailable for {model_name}, using torch: {e}")
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name)
+
+def load_dev_queries() -> List[str]:
+    """Task-A dev questions, used as parity inputs"""
+    question_file = os.path.join(current_dir, 'quran-qa-2023', 'Task-A', 'data', 'QQA23_TaskA_ayatec_v1.2_dev.tsv')
+    queries = []
+    with open(question_file, encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) == 2:
+                queries.append(parts[1])
+    return queries
+
+def check_bi_encoder_parity(model_name: str, queries: List[str]) -> Dict[str, float]:
+    """Cosine similarity between torch and ONNX query embeddings"""
+    from sentence_transformers import SentenceTransformer
+    reference = SentenceTransformer(model_name, device='cpu').encode(queries, convert_to_numpy=True)
+    candidate = load_onnx_bi_encoder(model_name).encode(queries)
+    reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate /= np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosine = np.einsum('ij,ij->i', reference, candidate)
+    return {'queries': len(queries), 'min_cosine': float(cosine.min()), 'mean_cosine': float(cosine.mean())}
+
+def check_cross_encoder_parity(model_name: str, queries: List[str], passages: List[str]) -> Dict[str, float]:
+    """Score differences and per-query top-1 agreement between torch and ONNX reranking"""
+    from sentence_transformers import CrossEncoder
+    pairs = [[query, passage] for query in queries for passage in passages]
+    reference = np.asarray(CrossEncoder(model_name, device='cpu').predict(pairs), dtype=np.float32).reshape(len(queries), -1)
+    candidate = np.asarray(load_onnx_cross_encoder(model_name).predict(pairs), dtype=np.float32).reshape(len(queries), -1)
+    return {
+        'pairs': len(pairs),
+        'max_abs_diff': float(np.abs(reference - candidate).max()),
+        'top1_agreement': float((reference.argmax(axis=1) == candidate.argmax(axis=1)).mean()),
+    }
+
+if __name__ == "__main__":
+    # python -m quran_model.onnx_backend <export|parity> <bi|cross> <model_name>
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 4 or sys.argv[1] not in ('export', 'parity') or sys.argv[2] not in ('bi', 'cross'):
+        print("Usage: python -m quran_model.onnx_backend <export|parity> <bi|cross> <model_name>")
+        sys.exit(1)
+    command, kind, model_name = sys.argv[1:]
+    if command == 'export':
+        (export_bi_encoder if kind == 'bi' else export_cross_encoder)(model_name)
+    else:
+        dev_queries = load_dev_queries()
+        if kind == 'bi':
+            print(check_bi_encoder_parity(model_name, dev_queries))
+        else:
+            from quran_model.utility import muat_jsonl
+            verses = [str(item) for item in muat_jsonl(os.path.join(current_dir, 'quran_terjemahan_sabiq.jsonl'))[:20]]
+            print(check_cross_encoder_parity(model_name, dev_queries, verses))
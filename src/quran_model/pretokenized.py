@@ -0,0 +1,223 @@
+import os
+import hashlib
+import logging
+from threading import Lock
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class CorpusTokenCache:
+    """Token ids (without special tokens) of every corpus text, truncated to max_length.
+
+    Stored as one flat int32 array plus row offsets, and persisted as .npz
+    together with a checksum over the corpus, tokenizer and max_length, so a
+    stale file is rebuilt instead of reused.
+    """
+
+    def __init__(self, ids: np.ndarray, offsets: np.ndarray, checksum: str):
+        self.ids = ids
+        self.offsets = offsets
+        self.checksum = checksum
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def row(self, i: int) -> List[int]:
+        return self.ids[self.offsets[i]:self.offsets[i + 1]].tolist()
+
+    @staticmethod
+    def make_checksum(corpus_checksum: str, tokenizer, max_length: int) -> str:
+        key = f"{corpus_checksum}|{getattr(tokenizer, 'name_or_path', type(tokenizer).__name__)}|{max_length}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def build(cls, tokenizer, texts: Sequence[str], max_length: int, checksum: str, chunk_size: int = 1024) -> 'CorpusTokenCache':
+        lengths, chunks = [], []
+        for start in range(0, len(texts), chunk_size):
+            for ids in tokenizer(list(texts[start:start + chunk_size]), add_special_tokens=False)['input_ids']:
+                ids = ids[:max_length]
+                lengths.append(len(ids))
+                chunks.append(np.asarray(ids, dtype=np.int32))
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        ids = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int32)
+        return cls(ids, offsets, checksum)
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            np.savez(f, ids=self.ids, offsets=self.offsets, checksum=np.asarray(self.checksum))
+
+    @classmethod
+    def load(cls, path: str, checksum: str) -> Optional['CorpusTokenCache']:
+        """The cache at path, or None if it is missing or was built for something else"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                if str(data['checksum']) != checksum:
+                    return None
+                return cls(data['ids'], data['offsets'], checksum)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable token cache {path}: {e}")
+            return None
+
+def load_corpus_token_cache(path: str, tokenizer, texts: Sequence[str], max_length: int, corpus_checksum: str) -> CorpusTokenCache:
+    """Open the persisted token cache for a tokenizer, building and saving it if it is missing or stale"""
+    checksum = CorpusTokenCache.make_checksum(corpus_checksum, tokenizer, max_length)
+    cache = CorpusTokenCache.load(path, checksum)
+    if cache is None:
+        logger.info(f"Tokenizing {len(texts)} corpus texts into {path}")
+        cache = CorpusTokenCache.build(tokenizer, texts, max_length, checksum)
+        try:
+            cache.save(path)
+        except OSError as e:
+            logger.warning(f"Could not persist token cache {path}: {e}")
+    return cache
+
+class PretokenizedCrossEncoder:
+    """CrossEncoder front end that takes the verse side of each pair from a CorpusTokenCache.
+
+    Only queries (and texts outside the corpus) are tokenized per call; the
+    pair inputs are assembled from ids with the tokenizer's own special-token
+    layout and longest-first truncation, then run through the underlying
+    model (torch or ONNX Runtime) with the CrossEncoder's activation.
+    The token cache is loaded on first use. A torch CrossEncoder whose
+    activation cannot be found is rejected with ValueError, since raw
+    logits would be on a different scale than CrossEncoder.predict.
+    """
+
+    def __init__(self, cross_encoder, korpus: Sequence[str], load_cache, max_cached_queries: int = 10000):
+        self.cross_encoder = cross_encoder
+        self.tokenizer = cross_encoder.tokenizer
+        self.max_length = getattr(cross_encoder, 'max_length', None) or self.tokenizer.model_max_length
+        self.korpus_rows: Dict[str, int] = {}
+        for row, text in enumerate(korpus):
+            self.korpus_rows.setdefault(text, row)
+        self.korpus_size = len(korpus)
+        self._load_cache = load_cache
+        self._cache: Optional[CorpusTokenCache] = None
+        self._cache_lock = Lock()
+        self._query_ids: Dict[str, List[int]] = {}
+        self.max_cached_queries = max_cached_queries
+        self._special_tokens = self.tokenizer.num_special_tokens_to_add(pair=True)
+        self.activation = None
+        if getattr(cross_encoder, 'session', None) is None:
+            # activation_fn in newer sentence-transformers, default_activation_function before
+            self.activation = getattr(cross_encoder, 'activation_fn', None)
+            if self.activation is None:
+                self.activation = getattr(cross_encoder, 'default_activation_function', None)
+            if self.activation is None:
+                raise ValueError(f"Cannot find the activation function of {type(cross_encoder).__name__}")
+
+    @property
+    def token_cache(self) -> CorpusTokenCache:
+        if self._cache is None:
+            with self._cache_lock:
+                if self._cache is None:
+                    cache = self._load_cache(self.tokenizer, self.max_length)
+                    if len(cache) != self.korpus_size:
+                        raise ValueError(f"Token cache has {len(cache)} rows, corpus has {self.korpus_size}")
+                    self._cache = cache
+        return self._cache
+
+    def _tokenize(self, texts: List[str]) -> Dict[str, List[int]]:
+        known = self._query_ids
+        missing = list({text for text in texts if text not in known})
+        if missing:
+            if len(known) + len(missing) > self.max_cached_queries:
+                known = self._query_ids = {}
+            for text, ids in zip(missing, self.tokenizer(missing, add_special_tokens=False)['input_ids']):
+                known[text] = ids[:self.max_length]
+        return {text: known[text] for text in texts}
+
+    def _document_ids(self, documents: List[str]) -> List[List[int]]:
+        cache = self.token_cache
+        rows = [self.korpus_rows.get(document) for document in documents]
+        outside = self._tokenize([document for document, row in zip(documents, rows) if row is None])
+        return [cache.row(row) if row is not None else outside[document] for document, row in zip(documents, rows)]
+
+    def token_lengths(self, texts: List[str]) -> List[int]:
+        """Token counts (without special tokens, up to max_length): corpus texts from the cache offsets, the rest tokenized once"""
+        cache = self.token_cache
+        rows = [self.korpus_rows.get(text) for text in texts]
+        outside = self._tokenize([text for text, row in zip(texts, rows) if row is None])
+        return [
+            int(cache.offsets[row + 1] - cache.offsets[row]) if row is not None else len(outside[text])
+            for text, row in zip(texts, rows)
+        ]
+
+    def _truncate(self, first: List[int], second: List[int]):
+        """Longest-first truncation of a pair to max_length including special tokens"""
+        budget = self.max_length - self._special_tokens
+        overflow = len(first) + len(second) - budget
+        if overflow <= 0:
+            return first, second
+        # Same split as transformers' longest_first: shorten the longer side down to the
+        # shorter one, then split the rest evenly (the extra token from the second side)
+        first_remove = min(abs(len(first) - len(second)), overflow)
+        second_remove = overflow - first_remove
+        if len(first) > len(second):
+            cut_first, cut_second = first_remove + second_remove // 2, second_remove - second_remove // 2
+        else:
+            cut_first, cut_second = second_remove // 2, first_remove + second_remove - second_remove // 2
+        return first[:len(first) - cut_first], second[:len(second) - cut_second]
+
+    def encode_pairs(self, pairs) -> Dict[str, np.ndarray]:
+        """Padded model inputs for the pairs, like tokenizer(queries, documents, padding=True, truncation='longest_first')"""
+        query_ids = self._tokenize([pair[0] for pair in pairs])
+        document_ids = self._document_ids([pair[1] for pair in pairs])
+        sequences, token_types = [], []
+        for (query, _), document in zip(pairs, document_ids):
+            first, second = self._truncate(query_ids[query], document)
+            sequences.append(self.tokenizer.build_inputs_with_special_tokens(first, second))
+            token_types.append(self.tokenizer.create_token_type_ids_from_sequences(first, second))
+
+        width = max(len(sequence) for sequence in sequences)
+        pad_id = self.tokenizer.pad_token_id or 0
+        input_ids = np.full((len(sequences), width), pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(sequences), width), dtype=np.int64)
+        token_type_ids = np.zeros((len(sequences), width), dtype=np.int64)
+        for i, (sequence, token_type) in enumerate(zip(sequences, token_types)):
+            input_ids[i, :len(sequence)] = sequence
+            attention_mask[i, :len(sequence)] = 1
+            token_type_ids[i, :len(token_type)] = token_type
+        return {'input_ids': input_ids, 'attention_mask': attention_mask, 'token_type_ids': token_type_ids}
+
+    def _forward(self, encoded: Dict[str, np.ndarray]) -> np.ndarray:
+        session = getattr(self.cross_encoder, 'session', None)
+        if session is not None:
+            # ONNX Runtime stand-in
+            names = {graph_input.name for graph_input in session.get_inputs()}
+            logits = session.run(None, {name: value for name, value in encoded.items() if name in names})[0]
+            if self.cross_encoder.num_labels == 1:
+                return 1.0 / (1.0 + np.exp(-logits[:, 0]))
+            return logits
+
+        import torch
+        model = self.cross_encoder.model
+        device = next(model.parameters()).device
+        features = {name: torch.from_numpy(value).to(device) for name, value in encoded.items()}
+        if 'token_type_ids' not in self.tokenizer.model_input_names:
+            features.pop('token_type_ids')
+        with torch.no_grad():
+            scores = self.activation(model(**features, return_dict=True).logits)
+        if model.config.num_labels == 1:
+            scores = scores[:, 0]
+        return scores.float().cpu().numpy()
+
+    def predict(self, pairs, batch_size: int = 32, **kwargs) -> np.ndarray:
+        if kwargs:
+            # Options such as apply_softmax or activation_fct change the scores, leave them to the CrossEncoder
+            return self.cross_encoder.predict(pairs, batch_size=batch_size, **kwargs)
+        pairs = [list(pair) for pair in pairs]
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        batch_size = batch_size or len(pairs)
+        return np.concatenate([
+            self._forward(self.encode_pairs(pairs[start:start + batch_size]))
+            for start in range(0, len(pairs), batch_size)
+        ])
+
+    def __getattr__(self, name):
+        return getattr(self.cross_encoder, name)
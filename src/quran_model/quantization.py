@@ -0,0 +1,109 @@
+import os
+import logging
+from typing import Tuple
+import numpy as np
+from quran_model.dense_retrieval import l2_normalize, top_k_indices, top_k_indices_batch
+from quran_model.embedding_store import load_embeddings, npy_path, resolve_embedding_path, save_embeddings
+
+logger = logging.getLogger(__name__)
+
+def quantize_int8(embeddings) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-dimension scalar quantization: x ~= offset + scale * (code + 128)"""
+    embeddings = l2_normalize(embeddings)
+    offset = embeddings.min(axis=0)
+    scale = (embeddings.max(axis=0) - offset) / 255.0
+    scale[scale == 0] = 1.0
+    codes = np.rint((embeddings - offset) / scale) - 128
+    return np.clip(codes, -128, 127).astype(np.int8), scale.astype(np.float32), offset.astype(np.float32)
+
+def int8_artifact_paths(embedding_path: str) -> Tuple[str, str]:
+    """(int8 codes, float32 rescoring matrix) stored next to an embedding artifact.
+
+    The rescoring matrix is the regular normalized .npy embedding artifact.
+    """
+    base, _ = os.path.splitext(embedding_path)
+    return base + '.int8.npz', npy_path(embedding_path)
+
+def build_int8_artifacts(embeddings, embedding_path: str) -> Tuple[str, str]:
+    """Write the int8 codes, plus the float32 .npy used for rescoring if it does not exist yet"""
+    codes_path, float_path = int8_artifact_paths(embedding_path)
+    normalized = l2_normalize(embeddings)
+    if not os.path.exists(float_path):
+        save_embeddings(normalized, embedding_path)
+    # Written last so the codes are never older than the artifact they were built from
+    codes, scale, offset = quantize_int8(normalized)
+    with open(codes_path, 'wb') as f:
+        np.savez(f, codes=codes, scale=scale, offset=offset)
+    logger.info(f"Saved int8 embeddings to {codes_path}")
+    return codes_path, float_path
+
+class Int8Index:
+    """Two-stage index: approximate scoring on int8 codes, exact rescoring of the top candidates.
+
+    The float32 vectors are memory-mapped, so only the rows picked for
+    rescoring are paged in. ``rescore_factor`` controls how many candidates
+    (top_k * rescore_factor) are rescored exactly.
+    """
+
+    def __init__(self, codes: np.ndarray, scale: np.ndarray, offset: np.ndarray, embeddings: np.ndarray, rescore_factor: int = 4, chunk_size: int = 4096):
+        self.codes = codes
+        self.scale = scale
+        self.offset = offset
+        self.embeddings = embeddings
+        self.rescore_factor = rescore_factor
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def load(cls, embedding_path: str, rescore_factor: int = 4) -> 'Int8Index':
+        codes_path, float_path = int8_artifact_paths(embedding_path)
+        with np.load(codes_path) as data:
+            codes, scale, offset = data['codes'], data['scale'], data['offset']
+        return cls(codes, scale, offset, np.load(float_path, mmap_mode='r'), rescore_factor=rescore_factor)
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.codes.shape[1]
+
+    def approximate_scores(self, queries: np.ndarray) -> np.ndarray:
+        """Dot products against the dequantized corpus, computed chunk by chunk from int8"""
+        scaled = queries * self.scale
+        bias = queries @ self.offset + 128.0 * scaled.sum(axis=1)
+        scores = np.empty((queries.shape[0], len(self)), dtype=np.float32)
+        for start in range(0, len(self), self.chunk_size):
+            chunk = self.codes[start:start + self.chunk_size].astype(np.float32)
+            scores[:, start:start + self.chunk_size] = scaled @ chunk.T
+        return scores + bias[:, None]
+
+    def search_batch(self, query_embeddings, top_k: int = 5, exact: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        queries = l2_normalize(query_embeddings)
+        num_candidates = len(self) if exact else min(len(self), top_k * self.rescore_factor)
+        candidates = top_k_indices_batch(self.approximate_scores(queries), num_candidates)
+
+        top_k = min(top_k, num_candidates)
+        all_indices = np.empty((queries.shape[0], top_k), dtype=np.int64)
+        all_scores = np.empty((queries.shape[0], top_k), dtype=np.float32)
+        for row, (query, rows) in enumerate(zip(queries, candidates)):
+            # Read rows in ascending order for sequential access to the memory map
+            rows = np.sort(rows)
+            exact_scores = np.asarray(self.embeddings[rows], dtype=np.float32) @ query
+            best = top_k_indices(exact_scores, top_k)
+            all_indices[row] = rows[best]
+            all_scores[row] = exact_scores[best]
+        return all_indices, all_scores
+
+    def search(self, query_embedding, top_k: int = 5, exact: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        indices, scores = self.search_batch(query_embedding, top_k, exact)
+        return indices[0], scores[0]
+
+def load_int8_index(embedding_path: str, rescore_factor: int = 4) -> Int8Index:
+    """Open the int8 index for an embedding file, building its artifacts on first use"""
+    codes_path, float_path = int8_artifact_paths(embedding_path)
+    stale = not (os.path.exists(codes_path) and os.path.exists(float_path)) or \
+        os.path.getmtime(codes_path) < os.path.getmtime(resolve_embedding_path(embedding_path))
+    if stale:
+        logger.info(f"Building int8 artifacts for {embedding_path}")
+        build_int8_artifacts(load_embeddings(embedding_path), embedding_path)
+    return Int8Index.load(embedding_path, rescore_factor=rescore_factor)
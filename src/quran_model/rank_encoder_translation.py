@@ -3,14 +3,18 @@ from sentence_transformers import util
 from typing import List, Tuple
 from quran_model.text_normalization import normalisasi_teks
 from quran_model.utility import muat_jsonl
+from quran_model.caching import cached_pair_scores
 
 class RankEncoderTranslation:
-    def __init__(self, bi_encoder, cross_encoder, embedding_korpus, daftar_string_terjemahan_quran):
+    def __init__(self, bi_encoder, cross_encoder, embedding_korpus, daftar_string_terjemahan_quran, cross_encoder_name='', score_cache=None):
         self.bi_encoder = bi_encoder
         self.cross_encoder = cross_encoder
         self.embedding_korpus = embedding_korpus
         self.daftar_string_terjemahan_quran = daftar_string_terjemahan_quran
         self.korpus = [str(item) for item in daftar_string_terjemahan_quran]
+        self.cross_encoder_name = cross_encoder_name
+        # Optional LRUCache of scores keyed on (cross_encoder_name, normalized query, corpus_id)
+        self.score_cache = score_cache
 
     def rank(self, query: str, candidates: List[dict]) -> List[dict]:
         """Rank the candidates using cross-encoder"""
@@ -25,41 +29,69 @@ class RankEncoderTranslation:
             normalized_query = normalisasi_teks(query)
             
             # Create cross-encoder pairs
-            pairs = [[normalized_query, self.korpus[hit['corpus_id']]] for hit in candidates]
+            pairs = [(normalized_query, hit['corpus_id']) for hit in candidates]
             
-            # Get cross-encoder scores
-            cross_scores = self.cross_encoder.predict(pairs)
+            # Get cross-encoder scores, predicting only pairs not scored before
+            cross_scores = cached_pair_scores(self.score_cache, self.cross_encoder, self.cross_encoder_name, pairs, self.korpus)
 
-            # Add scores to candidates
-            for idx, score in enumerate(cross_scores):
-                candidates[idx]['cross-score'] = float(score)
+            return self._format_ranked(candidates, cross_scores)
 
-            # Sort by cross-encoder score
-            candidates = sorted(candidates, key=lambda x: x['cross-score'], reverse=True)
+        except Exception as e:
+            raise Exception(f"Ranking failed: {str(e)}")
+
+    def rank_batch(self, queries: List[str], candidates_per_query: List[List[dict]]) -> List[List[dict]]:
+        """Rank candidates for several queries with a single cross-encoder call"""
+        if not self.cross_encoder:
+            raise Exception("Cross-encoder not initialized")
 
-            # Format results
+        try:
+            # Flatten every (query, candidate) pair into one predict call
+            pairs = []
+            for query, candidates in zip(queries, candidates_per_query):
+                normalized_query = normalisasi_teks(query)
+                pairs.extend((normalized_query, hit['corpus_id']) for hit in candidates)
+            cross_scores = cached_pair_scores(self.score_cache, self.cross_encoder, self.cross_encoder_name, pairs, self.korpus)
+
+            # Split the scores back per query
             results = []
-            seen_docs = set()
-            
-            for hit in candidates[:10]:
-                doc_id = str(hit['corpus_id'])
-                if doc_id not in seen_docs:
-                    results.append({
-                        'corpus_id': int(hit['corpus_id']),
-                        'text': self.korpus[hit['corpus_id']],
-                        'score': float(hit['score']) if 'score' in hit else 0.0,
-                        'cross-score': float(hit['cross-score']),
-                        'final_score': (float(hit['score']) + float(hit['cross-score'])) / 2 if 'score' in hit else float(hit['cross-score'])
-                    })
-                    seen_docs.add(doc_id)
-
-            if not results:
-                raise Exception("No valid results after ranking")
-
-            return results[:5]  # Return top 5 results
+            offset = 0
+            for candidates in candidates_per_query:
+                query_scores = cross_scores[offset:offset + len(candidates)]
+                offset += len(candidates)
+                results.append(self._format_ranked(candidates, query_scores) if candidates else [])
+            return results
 
         except Exception as e:
-            raise Exception(f"Ranking failed: {str(e)}")
+            raise Exception(f"Batch ranking failed: {str(e)}")
+
+    def _format_ranked(self, candidates: List[dict], cross_scores) -> List[dict]:
+        # Add scores to candidates
+        for idx, score in enumerate(cross_scores):
+            candidates[idx]['cross-score'] = float(score)
+
+        # Sort by cross-encoder score
+        candidates = sorted(candidates, key=lambda x: x['cross-score'], reverse=True)
+
+        # Format results
+        results = []
+        seen_docs = set()
+        
+        for hit in candidates[:10]:
+            doc_id = str(hit['corpus_id'])
+            if doc_id not in seen_docs:
+                results.append({
+                    'corpus_id': int(hit['corpus_id']),
+                    'text': self.korpus[hit['corpus_id']],
+                    'score': float(hit['score']) if 'score' in hit else 0.0,
+                    'cross-score': float(hit['cross-score']),
+                    'final_score': (float(hit['score']) + float(hit['cross-score'])) / 2 if 'score' in hit else float(hit['cross-score'])
+                })
+                seen_docs.add(doc_id)
+
+        if not results:
+            raise Exception("No valid results after ranking")
+
+        return results[:5]  # Return top 5 results
 
     def cari_dengan_pengkode_silang_terjemahan(self, query: str) -> List[dict]:
         """Search using cross-encoder on translation"""
@@ -0,0 +1,128 @@
+import gc
+import time
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+def model_nbytes(model) -> int:
+    """Parameter and buffer bytes of a torch model (SentenceTransformer, or the .model of a CrossEncoder)"""
+    if hasattr(model, 'nbytes'):
+        return model.nbytes  # ONNX Runtime models report their graph size
+    module = model if hasattr(model, 'parameters') else getattr(model, 'model', None)
+    if module is None or not hasattr(module, 'parameters'):
+        return 0
+    tensors = list(module.parameters()) + list(module.buffers() if hasattr(module, 'buffers') else [])
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+def index_nbytes(index) -> int:
+    """Bytes of an index's vectors: float32 embeddings, plus int8 codes when quantized"""
+    nbytes = getattr(getattr(index, 'embeddings', None), 'nbytes', 0)
+    codes = getattr(index, 'codes', None)
+    if codes is not None:
+        nbytes += codes.nbytes
+    return nbytes
+
+class ResidencyManager:
+    """Keeps loaded models and embedding sets within a memory budget, evicting the least recently used.
+
+    Components are registered with their measured size and an evict callback
+    that drops every reference to them; the caller reloads on demand. Sizes
+    are remembered after eviction, so room can be made before a known
+    component is loaded again. A budget of None only tracks usage.
+    """
+
+    def __init__(self, budget_bytes: Optional[int] = None):
+        self.budget_bytes = budget_bytes if budget_bytes and budget_bytes > 0 else None
+        self._resident: Dict[Hashable, Dict[str, Any]] = {}
+        self._known_sizes: Dict[Hashable, int] = {}
+        self._pinned = Counter()
+        self._lock = Lock()
+        self.evictions = 0
+
+    def register(self, key: Hashable, nbytes: int, evict: Callable[[], None]):
+        with self._lock:
+            self._resident[key] = {'nbytes': nbytes, 'evict': evict, 'last_used': time.monotonic()}
+            self._known_sizes[key] = nbytes
+            total = self.resident_bytes()
+        logger.info(f"Resident {key}: {nbytes / 2**20:.1f} MB (total {total / 2**20:.1f} MB)")
+
+    def touch(self, keys: Iterable[Hashable]):
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                if key in self._resident:
+                    self._resident[key]['last_used'] = now
+
+    @contextmanager
+    def pinned(self, keys: Iterable[Hashable]):
+        """Never evict keys inside this block, e.g. while the components are being loaded or a request is using them"""
+        keys = list(keys)
+        with self._lock:
+            self._pinned.update(keys)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pinned.subtract(keys)
+                self._pinned += Counter()  # drop zero counts
+
+    def is_resident(self, key: Hashable) -> bool:
+        return key in self._resident
+
+    def resident_bytes(self) -> int:
+        return sum(entry['nbytes'] for entry in self._resident.values())
+
+    def make_room(self, keys: Iterable[Hashable], protect: Iterable[Hashable] = ()):
+        """Before loading keys, evict enough LRU components for their last measured size to fit"""
+        needed = sum(self._known_sizes.get(key, 0) for key in keys if key not in self._resident)
+        self._evict_until(needed, set(protect) | set(keys))
+
+    def enforce(self, protect: Iterable[Hashable] = ()):
+        """Evict LRU components, except protected ones, until usage is back within budget"""
+        self._evict_until(0, set(protect))
+
+    def _evict_until(self, extra_bytes: int, protect: set):
+        if self.budget_bytes is None:
+            return
+        victims: List = []
+        with self._lock:
+            total = self.resident_bytes() + extra_bytes
+            candidates = sorted(
+                (key for key in self._resident if key not in protect and not self._pinned[key]),
+                key=lambda key: self._resident[key]['last_used']
+            )
+            for key in candidates:
+                if total <= self.budget_bytes:
+                    break
+                entry = self._resident.pop(key)
+                total -= entry['nbytes']
+                victims.append((key, entry))
+            if total > self.budget_bytes:
+                logger.warning(f"Memory budget {self.budget_bytes / 2**20:.0f} MB exceeded by components in use ({total / 2**20:.0f} MB)")
+
+        for key, entry in victims:
+            logger.info(f"Evicting {key} ({entry['nbytes'] / 2**20:.1f} MB)")
+            try:
+                entry['evict']()
+            except Exception as e:
+                logger.error(f"Failed to evict {key}: {e}")
+            self.evictions += 1
+        if victims:
+            gc.collect()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            resident = {
+                ' / '.join(map(str, key)) if isinstance(key, tuple) else str(key): entry['nbytes']
+                for key, entry in self._resident.items()
+            }
+        return {
+            'budget_bytes': self.budget_bytes,
+            'resident_bytes': sum(resident.values()),
+            'evictions': self.evictions,
+            'resident': resident,
+        }
@@ -1,17 +1,191 @@
 import os
 import sys
+import gc
+import time
+import signal
+import socket
+import logging
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import uvicorn
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("quran_model.run_server")
+
+# Crashed workers are restarted after an exponential backoff; after WORKER_MAX_RESTARTS crashes
+# in a row, each within WORKER_STABLE_SECONDS of starting, the master gives up and exits non-zero
+WORKER_RESTART_BACKOFF = float(os.environ.get("WORKER_RESTART_BACKOFF", "1"))
+WORKER_RESTART_BACKOFF_MAX = float(os.environ.get("WORKER_RESTART_BACKOFF_MAX", "30"))
+WORKER_MAX_RESTARTS = int(os.environ.get("WORKER_MAX_RESTARTS", "5"))
+WORKER_STABLE_SECONDS = float(os.environ.get("WORKER_STABLE_SECONDS", "60"))
+
+def memory_report() -> dict:
+    """Private vs shared memory of this process in kB, from /proc/self/smaps_rollup"""
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        return {}
+    return {
+        'rss_kb': fields.get('Rss', 0),
+        'pss_kb': fields.get('Pss', 0),
+        'shared_kb': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+        'private_kb': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+def preload(encoder_names):
+    """Build the corpus, embeddings and the given encoders in this (master) process"""
+    # No collections while the long-lived state is built, it is frozen below anyway
+    gc.disable()
+    from quran_model import serve_quran_model as server
+    server.preload_encoders(encoder_names)
+    for encoder_name in encoder_names:
+        logger.info(f"Preloading {encoder_name}")
+        try:
+            server.get_or_initialize_model(encoder_name)
+        except Exception as e:
+            logger.error(f"Failed to preload {encoder_name}: {e}")
+
+    server.get_gold_question_store()
+
+    # No pool threads may be alive (or mid-task) when the workers fork
+    server.init_executor.shutdown(wait=True)
+
+    # Move everything built so far into the permanent generation, so collections in
+    # the workers never write to (and un-share) the pages holding it
+    gc.collect()
+    gc.freeze()
+    return server
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def serve(app, sock: socket.socket, worker_id: int):
+    """Run one uvicorn server on the shared listening socket"""
+    gc.enable()
+
+    async def log_memory():
+        logger.info(f"Worker {worker_id} (pid {os.getpid()}) memory: {memory_report()}")
+
+    app.router.on_startup.append(log_memory)
+    config = uvicorn.Config(app, log_level="info", timeout_keep_alive=5)
+    uvicorn.Server(config).run(sockets=[sock])
+
+def run(host: str, port: int, workers: int, encoder_names):
+    server = preload(encoder_names)
+    logger.info(f"Master (pid {os.getpid()}) memory after preload: {memory_report()}")
+    if workers > 1 and server.INFERENCE_WORKERS > 0:
+        logger.warning("INFERENCE_WORKERS is set, every forked worker will start its own model server")
+
+    sock = bind_socket(host, port)
+    if workers <= 1:
+        serve(server.app, sock, 0)
+        return
+
+    children = {}
+    started = {}  # worker_id -> start time
+    crashes = {}  # worker_id -> crashes in a row
+    restarts = {}  # worker_id -> when to restart it
+    shutting_down = False
+    failed = False
+
+    def spawn(worker_id: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                serve(server.app, sock, worker_id)
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                logger.exception(f"Worker {worker_id} crashed")
+                code = 1
+            finally:
+                # Never return into the master's loop from a forked child
+                os._exit(code)
+        children[pid] = worker_id
+        started[worker_id] = time.monotonic()
+        logger.info(f"Started worker {worker_id} (pid {pid})")
+
+    def stop(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        restarts.clear()
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for worker_id in range(workers):
+        spawn(worker_id)
+
+    while children or restarts:
+        now = time.monotonic()
+        for worker_id, due in list(restarts.items()):
+            if due <= now:
+                del restarts[worker_id]
+                spawn(worker_id)
+        try:
+            if restarts:
+                # Poll so a pending restart is not held up waiting for another exit
+                pid, status = os.waitpid(-1, os.WNOHANG)
+                if pid == 0:
+                    time.sleep(min(0.5, max(0.0, min(restarts.values()) - time.monotonic())))
+                    continue
+            else:
+                pid, status = os.wait()
+        except ChildProcessError:
+            if restarts:
+                time.sleep(max(0.0, min(restarts.values()) - time.monotonic()))
+                continue
+            break
+        except InterruptedError:
+            continue
+        worker_id = children.pop(pid, None)
+        if worker_id is None or shutting_down:
+            continue
+
+        if time.monotonic() - started[worker_id] >= WORKER_STABLE_SECONDS:
+            crashes[worker_id] = 0
+        crashes[worker_id] = crashes.get(worker_id, 0) + 1
+        if crashes[worker_id] > WORKER_MAX_RESTARTS:
+            logger.error(f"Worker {worker_id} (pid {pid}) crashed {crashes[worker_id]} times in a row, shutting down")
+            failed = True
+            stop(None, None)
+            continue
+        delay = min(WORKER_RESTART_BACKOFF * 2 ** (crashes[worker_id] - 1), WORKER_RESTART_BACKOFF_MAX)
+        logger.warning(f"Worker {worker_id} (pid {pid}) exited with code {os.waitstatus_to_exitcode(status)}, restarting in {delay:.1f}s")
+        restarts[worker_id] = time.monotonic() + delay
+    sock.close()
+    if failed:
+        sys.exit(1)
+
 if __name__ == "__main__":
     try:
         # Get port from environment variable with fallback to 8001
         port = int(os.environ.get("PORT", "8001"))
-        print(f"Starting server on port {port}")
-        
-        # Use uvicorn CLI arguments style
-        os.system(f"uvicorn quran_model.serve_quran_model:app --host 0.0.0.0 --port {port}")
+        host = os.environ.get("HOST", "0.0.0.0")
+        # Worker processes forked from one preloaded master, sharing its read-only pages
+        workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+        encoder_names = [name.strip() for name in os.environ.get("PRELOAD_ENCODERS", "").split(",") if name.strip()]
+        print(f"Starting server on port {port} with {workers} worker(s)")
+        run(host, port, workers, encoder_names)
     except Exception as e:
         print(f"Error starting server: {str(e)}")
-        sys.exit(1) 
\ No newline at end of file
+        sys.exit(1)
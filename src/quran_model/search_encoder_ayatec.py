@@ -4,6 +4,7 @@ from pathlib import Path
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from quran_model.dense_retrieval import top_k_indices_batch
 
 class AyatecSearchEncoder:
     def __init__(self):
@@ -26,38 +27,47 @@ class AyatecSearchEncoder:
         self.question_vectors = self.vectorizer.fit_transform(self.questions['question'])
 
     def search(self, query: str, top_k: int = 5) -> List[Dict]:
-        # Vectorize the query
-        query_vector = self.vectorizer.transform([query])
+        return self.search_batch([query], top_k)[0]
+
+    def search_batch(self, queries: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """Score every query against the question bank with one sparse matrix product"""
+        if not queries:
+            return []
+
+        # Vectorize the queries
+        query_vectors = self.vectorizer.transform(queries)
         
         # Calculate similarities
-        similarities = cosine_similarity(query_vector, self.question_vectors)[0]
+        similarities = cosine_similarity(query_vectors, self.question_vectors)
         
-        # Get top k matches
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        # Get top k matches per query
+        top_indices = top_k_indices_batch(similarities, top_k)
+        
+        return [
+            [self._format_match(idx, similarities[row, idx]) for idx in top_indices[row]]
+            for row in range(len(queries))
+        ]
+
+    def _format_match(self, idx: int, similarity: float) -> Dict:
+        question_id = self.questions.iloc[idx]['id']
+        question = self.questions.iloc[idx]['question']
         
-        results = []
-        for idx in top_indices:
-            question_id = self.questions.iloc[idx]['id']
-            question = self.questions.iloc[idx]['question']
-            
-            # Get relevant verses for this question
-            verses = self.gold_answers[
-                (self.gold_answers['id'] == question_id) & 
-                (self.gold_answers['verse'] != '-1')
-            ]['verse'].tolist()
-            
-            results.append({
-                'id': str(question_id),
-                'question_ar': question,
-                'question_id': str(question_id),
-                'similarity_score': float(similarities[idx]),
-                'ayatec_match': {
-                    'question': question,
-                    'verses': verses
-                }
-            })
+        # Get relevant verses for this question
+        verses = self.gold_answers[
+            (self.gold_answers['id'] == question_id) & 
+            (self.gold_answers['verse'] != '-1')
+        ]['verse'].tolist()
         
-        return results
+        return {
+            'id': str(question_id),
+            'question_ar': question,
+            'question_id': str(question_id),
+            'similarity_score': float(similarity),
+            'ayatec_match': {
+                'question': question,
+                'verses': verses
+            }
+        }
 
     def encode(self, text: str) -> np.ndarray:
         # For compatibility with other encoders
@@ -1,14 +1,18 @@
 from typing import List, Dict
 import numpy as np
 from quran_model.text_normalization import normalisasi_teks
+from quran_model.dense_retrieval import as_index
+from quran_model.caching import cached_query_embeddings
 
 class OpenAISearchEncoder:
-    def __init__(self, client, embedding_korpus, daftar_string_terjemahan_quran):
+    def __init__(self, client, embedding_korpus, daftar_string_terjemahan_quran, query_cache=None):
         self.client = client
-        self.embedding_korpus = embedding_korpus
+        self.index = as_index(embedding_korpus)
+        self.embedding_korpus = self.index.embeddings
         self.daftar_string_terjemahan_quran = daftar_string_terjemahan_quran
         self.korpus = [str(item) for item in daftar_string_terjemahan_quran]
         self.rank_encoder = None  # Initialize rank_encoder as None
+        self.query_cache = query_cache
 
     def get_embedding(self, text: str) -> List[float]:
         response = self.client.embeddings.create(
@@ -17,64 +21,88 @@ class OpenAISearchEncoder:
         )
         return response.data[0].embedding
 
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts with a single API request"""
+        response = self.client.embeddings.create(
+            input=texts,
+            model="text-embedding-ada-002"
+        )
+        return [data.embedding for data in sorted(response.data, key=lambda d: d.index)]
+
+    def embed_queries(self, normalized_queries: List[str]) -> List:
+        """Query embeddings, skipping the API round trip for queries already in the cache"""
+        encode = lambda positions: self.get_embeddings([normalized_queries[i] for i in positions])
+        return cached_query_embeddings(self.query_cache, "text-embedding-ada-002", normalized_queries, encode)
+
     def search(self, query: str, top_k: int = 20) -> List[Dict]:
         try:
             # Normalize query
             normalized_query = normalisasi_teks(query)
             
             # Get query embedding
-            query_embedding = self.get_embedding(normalized_query)
+            query_embedding = self.embed_queries([normalized_query])[0]
             
-            # Convert embeddings to numpy arrays for efficient computation
-            query_embedding = np.array(query_embedding)
-            corpus_embeddings = np.array(self.embedding_korpus)
-            
-            # Compute cosine similarity
-            similarities = np.dot(corpus_embeddings, query_embedding) / (
-                np.linalg.norm(corpus_embeddings, axis=1) * np.linalg.norm(query_embedding)
-            )
-            
-            # Get top k results
-            top_k_idx = np.argsort(similarities)[-top_k:][::-1]
-            
-            # Format initial results
-            initial_results = []
-            for idx in top_k_idx:
-                initial_results.append({
-                    'corpus_id': int(idx),
-                    'score': float(similarities[idx]),
-                    'text': self.korpus[idx]
-                })
+            # Get top k results by cosine similarity
+            top_k_idx, top_k_scores = self.index.search(query_embedding, top_k)
             
-            # Use rank encoder if available
-            if self.rank_encoder is not None:
-                ranked_results = self.rank_encoder.rank(normalized_query, initial_results)
-                
-                # Ensure results have all required fields
-                final_results = []
-                for result in ranked_results:
-                    final_results.append({
-                        'corpus_id': result['corpus_id'],
-                        'text': result['text'],
-                        'score': result['score'],
-                        'cross-score': result['cross-score'],
-                        'final_score': result['final_score'],
-                        'map@10': result['score'],  # Use initial score as MAP@10
-                        'mrr': result['cross-score']  # Use cross-score as MRR
-                    })
-                return final_results
-            
-            # If no rank encoder, format results consistently
-            return [{
-                'corpus_id': r['corpus_id'],
-                'text': r['text'],
-                'score': r['score'],
-                'cross-score': r['score'],  # Use same score when no cross-encoder
-                'final_score': r['score'],
-                'map@10': r['score'],
-                'mrr': r['score']
-            } for r in initial_results]
+            return self._rank_hits(normalized_query, top_k_idx, top_k_scores)
 
         except Exception as e:
             print(f"Error in OpenAI search: {str(e)}")
-            return [] 
\ No newline at end of file
+            return []
+
+    def search_batch(self, queries: List[str], top_k: int = 20) -> List[List[Dict]]:
+        """Search many queries with one embeddings request and one matrix-matrix product"""
+        if not queries:
+            return []
+        try:
+            normalized_queries = [normalisasi_teks(query) for query in queries]
+            query_embeddings = self.embed_queries(normalized_queries)
+            top_k_idx, top_k_scores = self.index.search_batch(query_embeddings, top_k)
+            return [
+                self._rank_hits(normalized_query, indices, scores)
+                for normalized_query, indices, scores in zip(normalized_queries, top_k_idx, top_k_scores)
+            ]
+
+        except Exception as e:
+            print(f"Error in OpenAI batch search: {str(e)}")
+            return [[] for _ in queries]
+
+    def _rank_hits(self, normalized_query: str, top_k_idx, top_k_scores) -> List[Dict]:
+        # Format initial results
+        initial_results = []
+        for idx, score in zip(top_k_idx, top_k_scores):
+            initial_results.append({
+                'corpus_id': int(idx),
+                'score': float(score),
+                'text': self.korpus[idx]
+            })
+        
+        # Use rank encoder if available
+        if self.rank_encoder is not None:
+            ranked_results = self.rank_encoder.rank(normalized_query, initial_results)
+            
+            # Ensure results have all required fields
+            final_results = []
+            for result in ranked_results:
+                final_results.append({
+                    'corpus_id': result['corpus_id'],
+                    'text': result['text'],
+                    'score': result['score'],
+                    'cross-score': result['cross-score'],
+                    'final_score': result['final_score'],
+                    'map@10': result['score'],  # Use initial score as MAP@10
+                    'mrr': result['cross-score']  # Use cross-score as MRR
+                })
+            return final_results
+        
+        # If no rank encoder, format results consistently
+        return [{
+            'corpus_id': r['corpus_id'],
+            'text': r['text'],
+            'score': r['score'],
+            'cross-score': r['score'],  # Use same score when no cross-encoder
+            'final_score': r['score'],
+            'map@10': r['score'],
+            'mrr': r['score']
+        } for r in initial_results]
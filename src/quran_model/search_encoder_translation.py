@@ -2,37 +2,50 @@ from typing import List, Dict, Any, Optional
 from sentence_transformers import SentenceTransformer, CrossEncoder
 import numpy as np
 from quran_model.rank_encoder_translation import RankEncoderTranslation
+from quran_model.dense_retrieval import as_index
+from quran_model.caching import LRUCache, cached_query_embeddings
 
 class SearchEncoderTranslation:
-    def __init__(self, bi_encoder: SentenceTransformer, cross_encoder: CrossEncoder, embedding_korpus: np.ndarray, korpus: List[str]):
+    def __init__(self, bi_encoder: SentenceTransformer, cross_encoder: CrossEncoder, embedding_korpus: np.ndarray, korpus: List[str],
+                 encoder_name: str = '', query_cache: Optional[LRUCache] = None):
         self.bi_encoder = bi_encoder
         self.cross_encoder = cross_encoder
-        self.embedding_korpus = embedding_korpus
+        self.index = as_index(embedding_korpus)
+        self.embedding_korpus = self.index.embeddings
         self.korpus = korpus
         self.rank_encoder: Optional[RankEncoderTranslation] = None
+        self.encoder_name = encoder_name
+        self.query_cache = query_cache
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Query embeddings, served from the query cache when possible.
+
+        Keyed on the raw query because that is what the bi-encoder embeds;
+        normalized keys would let "Sholat?" reuse the embedding of "sholat".
+        """
+        encode = lambda positions: self.bi_encoder.encode([queries[i] for i in positions], convert_to_numpy=True)
+        return np.stack(cached_query_embeddings(self.query_cache, self.encoder_name, list(queries), encode))
+
+    def _to_candidates(self, indices, scores) -> List[Dict[str, Any]]:
+        candidates = []
+        for idx, score in zip(indices, scores):
+            score = float(score)
+            if score > 0:  # Only include positive scores
+                candidates.append({
+                    'corpus_id': int(idx),
+                    'text': self.korpus[idx],
+                    'score': score
+                })
+        return candidates
 
     def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         try:
             # Get query embedding
-            query_embedding = self.bi_encoder.encode(query, convert_to_tensor=True)
+            query_embedding = self.encode_queries([query])[0]
             
-            # Calculate cosine similarities
-            cos_scores = np.dot(self.embedding_korpus, query_embedding) / (
-                np.linalg.norm(self.embedding_korpus, axis=1) * np.linalg.norm(query_embedding)
-            )
-            
-            # Get top-k results
-            top_results = []
-            top_indices = np.argsort(-cos_scores)[:top_k]
-            
-            for idx in top_indices:
-                score = float(cos_scores[idx])
-                if score > 0:  # Only include positive scores
-                    top_results.append({
-                        'corpus_id': int(idx),
-                        'text': self.korpus[idx],
-                        'score': score
-                    })
+            # Get top-k results by cosine similarity
+            top_indices, top_scores = self.index.search(query_embedding, top_k)
+            top_results = self._to_candidates(top_indices, top_scores)
             
             # Use rank_encoder if available
             if self.rank_encoder and top_results:
@@ -52,4 +65,30 @@ class SearchEncoderTranslation:
             return top_results
 
         except Exception as e:
-            raise Exception(f"Search failed: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Search failed: {str(e)}")
+
+    def search_batch(self, queries: List[str], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """Search many queries with one batched encode and one matrix-matrix product.
+
+        Returns one result list per query, in input order. Queries without
+        positive-scoring candidates get an empty list instead of failing the batch.
+        """
+        if not queries:
+            return []
+        try:
+            query_embeddings = self.encode_queries(list(queries))
+            top_indices, top_scores = self.index.search_batch(query_embeddings, top_k)
+            candidates = [self._to_candidates(indices, scores) for indices, scores in zip(top_indices, top_scores)]
+
+            if not self.rank_encoder:
+                return candidates
+
+            # Rerank every query that has candidates in a single cross-encoder call
+            to_rank = [i for i, hits in enumerate(candidates) if hits]
+            ranked = self.rank_encoder.rank_batch([queries[i] for i in to_rank], [candidates[i] for i in to_rank])
+            for i, ranked_results in zip(to_rank, ranked):
+                candidates[i] = ranked_results
+            return candidates
+
+        except Exception as e:
+            raise Exception(f"Batch search failed: {str(e)}")
@@ -1,6 +1,8 @@
 import os
 import sys
+import asyncio
 import json
+import hashlib
 import numpy as np
 from typing import List, Optional, Dict, Any
 from fastapi import FastAPI, HTTPException, Request
@@ -14,8 +16,9 @@ from sentence_transformers import SentenceTransformer, CrossEncoder
 from openai import OpenAI
 import time
 from sklearn.metrics.pairwise import cosine_similarity
-from threading import Lock
-from fastapi.responses import JSONResponse
+from threading import Lock, RLock, Thread
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from fastapi.responses import JSONResponse, Response
 import openai
 
 # Import Quran-specific modules
@@ -26,6 +29,22 @@ from quran_model.rank_encoder_openai import RankEncoderOpenAI
 from quran_model.text_normalization import normalisasi_teks
 from quran_model.utility import muat_jsonl
 from quran_model.search_encoder_ayatec import AyatecSearchEncoder
+from quran_model.dense_retrieval import DenseIndex
+from quran_model.embedding_store import (
+    MANIFEST_FILE, EmbeddingManifestError, corpus_checksum, load_embeddings, load_manifest, resolve_embedding_path,
+    validate_embeddings, validate_manifest_entry
+)
+from quran_model.ann_index import load_ann_index
+from quran_model.quantization import load_int8_index
+from quran_model.caching import LRUCache
+from quran_model.batching import BatchingBiEncoder, BatchingCrossEncoder, LengthBucketedCrossEncoder
+from quran_model.executors import BoundedExecutor, ExecutorSaturatedError
+from quran_model.model_server import ModelServer
+from quran_model.residency import ResidencyManager, index_nbytes, model_nbytes
+from quran_model.onnx_backend import load_bi_encoder, load_cross_encoder
+from quran_model.pretokenized import PretokenizedCrossEncoder, load_corpus_token_cache
+from quran_model.gold_questions import GoldQuestionStore, load_question_variants
+from quran_model.verse_index import VerseIndex, parse_verse_id, parse_verse_ranges
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -49,13 +68,54 @@ except Exception as e:
     logger.error(f"Error loading translation data: {e}")
     sys.exit(1)
 
+# (sura, aya) -> record, for verse lookups that need no model
+verse_index = VerseIndex(daftar_string_terjemahan_quran)
+logger.info(f"Indexed {len(verse_index)} verses for direct lookup")
+
+# Inference backend for bi- and cross-encoders: 'torch' (default) or 'onnx' (ONNX Runtime, INT8 by default)
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'torch')
+
+# Optional int8 embedding store ('int8' or unset) and how many candidates per result get exact rescoring
+EMBEDDING_QUANTIZATION = os.getenv('EMBEDDING_QUANTIZATION')
+INT8_RESCORE_FACTOR = int(os.getenv('INT8_RESCORE_FACTOR', '4'))
+
+# Query embedding cache, keyed on (encoder name, query text as the encoder embeds it)
+query_embedding_cache = LRUCache(
+    maxsize=int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '4096')),
+    ttl=float(os.getenv('QUERY_EMBEDDING_CACHE_TTL', '3600'))
+)
+
+# Full /api/search response cache, keyed on (encoder, search_type, top_k, query)
+search_response_cache = LRUCache(
+    maxsize=int(os.getenv('SEARCH_RESPONSE_CACHE_SIZE', '2048')),
+    ttl=float(os.getenv('SEARCH_RESPONSE_CACHE_TTL', '600'))
+)
+
+# Cross-encoder pair scores, keyed on (cross-encoder name, normalized query, corpus_id)
+cross_encoder_score_cache = LRUCache(
+    maxsize=int(os.getenv('CROSS_ENCODER_CACHE_SIZE', '100000')),
+    ttl=float(os.getenv('CROSS_ENCODER_CACHE_TTL', '86400'))
+)
+
+def invalidate_encoder_caches(encoder_name: str):
+    """Drop cached query vectors, pair scores and responses computed with an encoder's previous model or embeddings"""
+    dropped = search_response_cache.invalidate(lambda key: key[0] == encoder_name)
+    dropped += query_embedding_cache.invalidate(lambda key: key[0] == encoder_name)
+    cross_encoder_name = ENCODER_MODELS[encoder_name].get('cross_encoder_name')
+    if cross_encoder_name:
+        dropped += cross_encoder_score_cache.invalidate(lambda key: key[0] == cross_encoder_name)
+    if dropped:
+        logger.info(f"Invalidated {dropped} cached entries for {encoder_name}")
+
 # Initialize encoder models dictionary
 ENCODER_MODELS = {
     'firqaaa/indo-sentence-bert-base': {
         'name': 'firqaaa/indo-sentence-bert-base',
         'bi_encoder': None,
         'cross_encoder': None,
-        'embedding_file': 'embedding_korpus_1.pkl',
+        'embedding_file': 'embedding_korpus_1.npy',
+        'ann_index': None,  # exact search
+        'quantization': EMBEDDING_QUANTIZATION,
         'cross_encoder_name': 'Rifky/Indobert-QA',
         'type': 'transformer'
     },
@@ -63,7 +123,9 @@ ENCODER_MODELS = {
         'name': 'indobenchmark/indobert-base-p1',
         'bi_encoder': None,
         'cross_encoder': None,
-        'embedding_file': 'embedding_korpus_2.pkl',
+        'embedding_file': 'embedding_korpus_2.npy',
+        'ann_index': None,  # exact search
+        'quantization': EMBEDDING_QUANTIZATION,
         'cross_encoder_name': 'indobenchmark/indobert-base-p2',
         'type': 'transformer'
     },
@@ -71,7 +133,9 @@ ENCODER_MODELS = {
         'name': 'msmarco-distilbert-base-tas-b',
         'bi_encoder': None,
         'cross_encoder': None,
-        'embedding_file': 'embedding_korpus_3.pkl',
+        'embedding_file': 'embedding_korpus_3.npy',
+        'ann_index': None,  # exact search
+        'quantization': EMBEDDING_QUANTIZATION,
         'cross_encoder_name': 'cross-encoder/ms-marco-MiniLM-L-6-v2',
         'type': 'transformer'
     },
@@ -79,7 +143,9 @@ ENCODER_MODELS = {
         'name': 'aubmindlab/bert-base-arabert',
         'bi_encoder': None,
         'cross_encoder': None,
-        'embedding_file': 'embedding_korpus_4.pkl',
+        'embedding_file': 'embedding_korpus_4.npy',
+        'ann_index': None,  # exact search
+        'quantization': EMBEDDING_QUANTIZATION,
         'cross_encoder_name': 'aubmindlab/araelectra-base-discriminator',
         'type': 'transformer'
     },
@@ -87,7 +153,9 @@ ENCODER_MODELS = {
         'name': 'text-embedding-ada-002',
         'bi_encoder': None,
         'cross_encoder': None,
-        'embedding_file': 'embedding_korpus_5.pkl',
+        'embedding_file': 'embedding_korpus_5.npy',
+        'ann_index': {'type': 'hnsw', 'ef': 64},  # falls back to exact search if not built
+        'quantization': EMBEDDING_QUANTIZATION,
         'cross_encoder_name': 'gpt-3.5-turbo-instruct',
         'type': 'openai'
     },
@@ -97,17 +165,97 @@ ENCODER_MODELS = {
     }
 }
 
-# Load embeddings for each model
+# Validate embedding artifacts against the manifest up front; vectors are loaded lazily on first use
+corpus_checksum_current = corpus_checksum(daftar_string_hanya_terjemahan)
+embedding_manifest = load_manifest(os.path.join(current_dir, MANIFEST_FILE))
+embedding_locks = {}
+
 for model_name, model_info in ENCODER_MODELS.items():
+    if model_info['type'] not in ['transformer', 'openai']:
+        continue
+    model_info['embeddings'] = None
+    model_info['index'] = None
+    model_info['embedding_error'] = None
+    model_info['manifest'] = embedding_manifest.get('encoders', {}).get(model_name)
+    embedding_locks[model_name] = Lock()
     try:
-        if model_info['type'] in ['transformer', 'openai']:
-            embeddings_file = os.path.join(current_dir, model_info['embedding_file'])
-            with open(embeddings_file, "rb") as f:
-                model_info['embeddings'] = pickle.load(f)
-                logger.info(f"Loaded embeddings for {model_name}")
+        resolve_embedding_path(os.path.join(current_dir, model_info['embedding_file']))
+        if model_info['manifest'] is None:
+            logger.warning(f"No manifest entry for {model_name}, corpus consistency cannot be verified")
+        else:
+            validate_manifest_entry(model_info['manifest'], corpus_checksum_current)
     except Exception as e:
-        logger.error(f"Error loading embeddings for {model_name}: {e}")
-        model_info['embeddings'] = None
+        logger.error(f"Rejecting embeddings for {model_name}: {e}")
+        model_info['embedding_error'] = str(e)
+
+# Loaded bi-encoders, cross-encoders and embedding sets are kept within MODEL_MEMORY_BUDGET_MB
+# (unset: no limit), evicting the least recently used encoder components and reloading on demand
+MODEL_MEMORY_BUDGET_MB = float(os.getenv('MODEL_MEMORY_BUDGET_MB', '0'))
+residency = ResidencyManager(int(MODEL_MEMORY_BUDGET_MB * 2**20))
+
+def encoder_components(encoder_name: str) -> List[tuple]:
+    return [(encoder_name, 'embeddings'), (encoder_name, 'bi_encoder'), (encoder_name, 'cross_encoder')]
+
+def evict_component(encoder_name: str, component: str):
+    """Drop every reference to one component of an encoder; the next request rebuilds what is missing"""
+    model_info = ENCODER_MODELS[encoder_name]
+    encoders.pop(encoder_name, None)  # the built search encoder references all of its components
+    if component == 'embeddings':
+        with embedding_locks[encoder_name]:
+            model_info['embeddings'] = None
+            model_info['index'] = None
+    else:
+        model_info[component] = None
+        close_batching(model_info, component)
+
+def close_batching(model_info: Dict[str, Any], component: str):
+    """Stop and drop a component's micro-batching wrapper, whose thread otherwise keeps the model alive.
+
+    Work already queued still runs; anyone still holding the wrapper afterwards calls the model directly.
+    """
+    batching = model_info.pop(f'{component}_batching', None)
+    wrapper = batching[1] if isinstance(batching, tuple) else batching
+    if isinstance(wrapper, (BatchingCrossEncoder, BatchingBiEncoder)):
+        wrapper.close()
+
+def get_encoder_index(encoder_name: str):
+    """Load an encoder's embeddings and search index on first use"""
+    model_info = ENCODER_MODELS[encoder_name]
+    if model_info['index'] is not None:
+        return model_info['index']
+    if model_info['embedding_error']:
+        raise HTTPException(status_code=500, detail=f"Embeddings not available for encoder {encoder_name}: {model_info['embedding_error']}")
+
+    with embedding_locks[encoder_name]:
+        if model_info['index'] is not None:
+            return model_info['index']
+        try:
+            embeddings_file = os.path.join(current_dir, model_info['embedding_file'])
+            if model_info.get('quantization') == 'int8':
+                # Score on int8 codes, rescore the top candidates against memory-mapped float32 vectors
+                index = load_int8_index(embeddings_file, rescore_factor=INT8_RESCORE_FACTOR)
+                embeddings = index.embeddings
+            else:
+                # Memory-mapped .npy (or legacy pickle) as a normalized float32 matrix shared by the search encoders
+                embeddings = load_embeddings(embeddings_file)
+                index = DenseIndex(
+                    embeddings,
+                    ann=load_ann_index(model_info.get('ann_index'), embeddings, embeddings_file)
+                )
+            validate_embeddings(embeddings, model_info['manifest'], len(daftar_string_hanya_terjemahan))
+        except Exception as e:
+            logger.error(f"Error loading embeddings for {encoder_name}: {e}")
+            if isinstance(e, EmbeddingManifestError):
+                # A mismatched artifact will not fix itself, reject it for good
+                model_info['embedding_error'] = str(e)
+            raise HTTPException(status_code=500, detail=f"Embeddings not available for encoder {encoder_name}: {e}")
+
+        logger.info(f"Loaded embeddings for {encoder_name}: {embeddings.shape}")
+        model_info['embeddings'] = embeddings
+        model_info['index'] = index
+        residency.register((encoder_name, 'embeddings'), index_nbytes(index), lambda: evict_component(encoder_name, 'embeddings'))
+        invalidate_encoder_caches(encoder_name)
+        return index
 
 # Initialize OpenAI client if needed
 api_key = os.getenv('OPENAI_API_KEY')
@@ -142,6 +290,7 @@ class QuranSearchRequest(BaseModel):
     search_type: str = "translation"  # or "paraphrase"
     top_k: int = 5
     encoder: str  # Remove default encoder to force explicit selection
+    include_relevancy: bool = True  # False skips relevancy metrics and related questions
 
 class QuranSearchResult(BaseModel):
     verse_id: str
@@ -163,45 +312,232 @@ class QuranSearchResponse(BaseModel):
     relevancy_metrics: Optional[Dict[str, float]] = None
     related_questions: Optional[List[Dict[str, Any]]] = None
 
+class QuranVerse(BaseModel):
+    verse_id: str
+    sura: int
+    aya: int
+    arabic_text: str
+    translation: str
+
+class QuranVersesResponse(BaseModel):
+    verses: List[QuranVerse]
+    missing: List[str]
+
+# Cross-encoder micro-batching across concurrent requests (wait <= 0 disables it); each merged
+# batch is then split into length buckets of at most CROSS_ENCODER_BUCKET_SIZE pairs (0 disables it)
+CROSS_ENCODER_BATCH_SIZE = int(os.getenv('CROSS_ENCODER_BATCH_SIZE', '64'))
+CROSS_ENCODER_BATCH_WAIT_MS = float(os.getenv('CROSS_ENCODER_BATCH_WAIT_MS', '5'))
+CROSS_ENCODER_BUCKET_SIZE = int(os.getenv('CROSS_ENCODER_BUCKET_SIZE', '32'))
+
+# Verse-side token ids of each cross-encoder, tokenized once and persisted next to the embeddings
+CROSS_ENCODER_PRETOKENIZE = os.getenv('CROSS_ENCODER_PRETOKENIZE', '1') not in ('0', 'false', 'False')
+
+def corpus_token_cache_loader(cross_encoder_name: str):
+    path = os.path.join(current_dir, f"corpus_tokens_{cross_encoder_name.replace('/', '__')}.npz")
+    return lambda tokenizer, max_length: load_corpus_token_cache(
+        path, tokenizer, daftar_string_hanya_terjemahan, max_length, corpus_checksum_current
+    )
+
+def get_batching_cross_encoder(model_info: Dict[str, Any]):
+    """The cross-encoder used for reranking, behind the verse token cache, length bucketing and one shared micro-batching queue per model"""
+    cross_encoder = model_info['cross_encoder']
+    batching = model_info.get('cross_encoder_batching')
+    if batching is not None and batching[0] is cross_encoder:
+        return batching[1]
+    close_batching(model_info, 'cross_encoder')  # wraps a model that has since been replaced
+
+    wrapped = cross_encoder
+    if CROSS_ENCODER_PRETOKENIZE and getattr(cross_encoder, 'tokenizer', None) is not None:
+        try:
+            wrapped = PretokenizedCrossEncoder(
+                wrapped,
+                daftar_string_hanya_terjemahan,
+                corpus_token_cache_loader(model_info['cross_encoder_name'])
+            )
+        except ValueError as e:
+            logger.warning(f"Not pre-tokenizing for {model_info['cross_encoder_name']}: {e}")
+    if CROSS_ENCODER_BUCKET_SIZE > 0:
+        wrapped = LengthBucketedCrossEncoder(wrapped, bucket_size=CROSS_ENCODER_BUCKET_SIZE)
+    if CROSS_ENCODER_BATCH_WAIT_MS > 0:
+        wrapped = BatchingCrossEncoder(
+            wrapped,
+            max_batch_size=CROSS_ENCODER_BATCH_SIZE,
+            max_wait_ms=CROSS_ENCODER_BATCH_WAIT_MS
+        )
+    model_info['cross_encoder_batching'] = (cross_encoder, wrapped)
+    return wrapped
+
+# Bi-encoder query micro-batching across concurrent requests (wait <= 0 disables it)
+BI_ENCODER_BATCH_SIZE = int(os.getenv('BI_ENCODER_BATCH_SIZE', '64'))
+BI_ENCODER_BATCH_WAIT_MS = float(os.getenv('BI_ENCODER_BATCH_WAIT_MS', '5'))
+
+def get_batching_bi_encoder(model_info: Dict[str, Any]):
+    """The bi-encoder used for query encoding, behind one shared micro-batching queue per model"""
+    bi_encoder = model_info['bi_encoder']
+    if BI_ENCODER_BATCH_WAIT_MS <= 0:
+        return bi_encoder
+    batching = model_info.get('bi_encoder_batching')
+    if batching is None or batching.bi_encoder is not bi_encoder:
+        close_batching(model_info, 'bi_encoder')  # wraps a model that has since been replaced
+        batching = BatchingBiEncoder(
+            bi_encoder,
+            max_batch_size=BI_ENCODER_BATCH_SIZE,
+            max_wait_ms=BI_ENCODER_BATCH_WAIT_MS
+        )
+        model_info['bi_encoder_batching'] = batching
+    return batching
+
+# Blocking search work runs off the event loop: torch inference on a small pool
+# (torch releases the GIL), OpenAI HTTP calls on a separate I/O pool so slow API
+# round trips never occupy inference threads, and relevancy scoring on its own pool so it
+# runs alongside retrieval. Requests beyond the queue depth get 503.
+# With micro-batching on, torch runs on the batchers' threads and an inference thread
+# mostly waits on a batcher, once per stage; a merged batch can never hold more
+# requests than there are such threads, so the pool is sized to the largest batch.
+MICRO_BATCH_WIDTH = max(
+    CROSS_ENCODER_BATCH_SIZE if CROSS_ENCODER_BATCH_WAIT_MS > 0 else 0,
+    BI_ENCODER_BATCH_SIZE if BI_ENCODER_BATCH_WAIT_MS > 0 else 0
+)
+INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', str(max(min(4, os.cpu_count() or 1), MICRO_BATCH_WIDTH))))
+INFERENCE_QUEUE_SIZE = int(os.getenv('INFERENCE_QUEUE_SIZE', str(max(64, 2 * INFERENCE_THREADS))))
+if 0 < INFERENCE_THREADS < MICRO_BATCH_WIDTH:
+    logger.warning(f"INFERENCE_THREADS={INFERENCE_THREADS} caps micro-batches below their size of {MICRO_BATCH_WIDTH}")
+IO_THREADS = int(os.getenv('IO_THREADS', '16'))
+IO_QUEUE_SIZE = int(os.getenv('IO_QUEUE_SIZE', '128'))
+inference_executor = BoundedExecutor(INFERENCE_THREADS, INFERENCE_QUEUE_SIZE, name='inference')
+io_executor = BoundedExecutor(IO_THREADS, IO_QUEUE_SIZE, name='io')
+RELEVANCY_THREADS = int(os.getenv('RELEVANCY_THREADS', '2'))
+relevancy_executor = BoundedExecutor(RELEVANCY_THREADS, INFERENCE_QUEUE_SIZE, name='relevancy')
+
+def executor_for(encoder_name: str) -> BoundedExecutor:
+    if ENCODER_MODELS.get(encoder_name, {}).get('type') == 'openai':
+        return io_executor
+    if model_server is not None and model_server.serves(encoder_name):
+        return io_executor  # only waits on a worker process
+    return inference_executor
+
+# Model-server mode: with INFERENCE_WORKERS > 0 the transformer encoders run in that many
+# worker processes, sharing the corpus embeddings through shared memory
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', '0'))
+MODEL_SERVER_TIMEOUT = float(os.getenv('MODEL_SERVER_TIMEOUT', '60'))
+model_server = None
+
+def start_model_server():
+    """Copy the transformer encoders' embeddings into shared memory and spawn the inference workers"""
+    global model_server
+    served = {}
+    for name, model_info in ENCODER_MODELS.items():
+        if model_info['type'] != 'transformer' or model_info['embedding_error']:
+            continue
+        embeddings_file = os.path.join(current_dir, model_info['embedding_file'])
+        try:
+            embeddings = load_embeddings(embeddings_file)
+            validate_embeddings(embeddings, model_info['manifest'], len(daftar_string_hanya_terjemahan))
+        except Exception as e:
+            logger.error(f"Not serving {name} from the model server: {e}")
+            continue
+        served[name] = {
+            'embeddings': embeddings,
+            'embedding_path': embeddings_file,
+            'ann_index': model_info.get('ann_index'),
+            'cross_encoder_name': model_info.get('cross_encoder_name'),
+            'backend': INFERENCE_BACKEND
+        }
+    if not served:
+        logger.warning("Model server enabled but no transformer embeddings are available")
+        return
+
+    server = ModelServer(min(INFERENCE_WORKERS, len(served)), timeout=MODEL_SERVER_TIMEOUT)
+    server.start(served, daftar_string_terjemahan_quran)
+    model_server = server
+
 # Global variables for model caching
 encoders = {}
-encoder_locks = {}
+init_futures = {}
+init_futures_lock = RLock()
 model_cache = {}
 
+# Encoders are built once each on a dedicated pool: concurrent requests for the same encoder
+# wait on one shared future, different encoders build in parallel
+MODEL_INIT_THREADS = int(os.getenv('MODEL_INIT_THREADS', '4'))
+MODEL_INIT_TIMEOUT = float(os.getenv('MODEL_INIT_TIMEOUT', '300'))
+PRELOAD_ENCODERS = [name.strip() for name in os.getenv('PRELOAD_ENCODERS', '').split(',') if name.strip()]
+init_executor = BoundedExecutor(MODEL_INIT_THREADS, max_pending=len(ENCODER_MODELS), name='model-init')
+
+def start_model_initialization(encoder_name: str) -> Future:
+    """The shared initialization future of an encoder, starting one if none is running"""
+    with init_futures_lock:
+        future = init_futures.get(encoder_name)
+        if future is None:
+            future = init_executor.submit(initialize_model, encoder_name)
+            init_futures[encoder_name] = future
+            future.add_done_callback(lambda done: forget_init_future(encoder_name, done))
+        return future
+
+def forget_init_future(encoder_name: str, future: Future):
+    # A built model lives on in encoders; after a failure the next request retries
+    with init_futures_lock:
+        if init_futures.get(encoder_name) is future:
+            del init_futures[encoder_name]
+
+def preload_encoders(encoder_names: List[str]):
+    """Start building encoders in the background without waiting for them"""
+    for encoder_name in encoder_names:
+        if encoder_name not in ENCODER_MODELS:
+            logger.warning(f"Cannot preload unknown encoder {encoder_name}")
+        elif encoders.get(encoder_name) is None and not (model_server is not None and model_server.serves(encoder_name)):
+            start_model_initialization(encoder_name)
+
 def get_or_initialize_model(encoder_name: str):
-    global encoders, encoder_locks, model_cache
-    
     if encoder_name not in ENCODER_MODELS:
         raise HTTPException(status_code=400, detail=f"Encoder {encoder_name} not supported")
     
     logger.info(f"Requested encoder: {encoder_name}")
+
+    # Served by an inference worker process, nothing to load here
+    if model_server is not None and model_server.serves(encoder_name):
+        return model_server.encoder(encoder_name)
         
     # If encoder is already initialized, return it
     if encoder_name in encoders and encoders[encoder_name] is not None:
         logger.info(f"Using cached encoder: {encoder_name}")
+        residency.touch(encoder_components(encoder_name))
         return encoders[encoder_name]
-        
-    # Initialize lock if not exists
-    if encoder_name not in encoder_locks:
-        encoder_locks[encoder_name] = Lock()
-    
-    lock = encoder_locks[encoder_name]
-    
-    # Try to acquire the lock
-    if not lock.acquire(blocking=False):
-        # If we can't get the lock, someone else is initializing
-        # Wait for a short time and check if the model is ready
-        time.sleep(0.1)
-        if encoder_name in encoders and encoders[encoder_name] is not None:
-            return encoders[encoder_name]
-        raise HTTPException(status_code=503, detail="Model is being initialized by another request")
-    
+
+    # Join (or start) the encoder's initialization
+    future = start_model_initialization(encoder_name)
+    try:
+        return future.result(timeout=MODEL_INIT_TIMEOUT)
+    except FutureTimeoutError:
+        raise HTTPException(status_code=503, detail=f"Encoder {encoder_name} is still initializing, please retry")
+
+async def wait_for_model_initialization(encoder_name: str):
+    """Await an encoder's initialization on the event loop, so no executor thread sits blocked on it"""
+    if encoder_name not in ENCODER_MODELS or encoders.get(encoder_name) is not None:
+        return
+    if model_server is not None and model_server.serves(encoder_name):
+        return
+    future = asyncio.wrap_future(start_model_initialization(encoder_name))
+    try:
+        await asyncio.wait_for(asyncio.shield(future), MODEL_INIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail=f"Encoder {encoder_name} is still initializing, please retry")
+
+def initialize_model(encoder_name: str):
+    """Build an encoder within the memory budget and register it in encoders; runs on init_executor"""
+    components = encoder_components(encoder_name)
+    with residency.pinned(components):
+        residency.make_room(components)
+        model = build_model(encoder_name)
+    residency.enforce(protect=components)
+    return model
+
+def build_model(encoder_name: str):
     try:
         model_info = ENCODER_MODELS[encoder_name]
-        embeddings = model_info['embeddings']
-        
-        if embeddings is None:
-            raise HTTPException(status_code=500, detail=f"Embeddings not available for encoder {encoder_name}")
+        if model_info['type'] in ['transformer', 'openai']:
+            get_encoder_index(encoder_name)
+            embeddings = model_info['embeddings']
 
         if model_info['type'] == 'transformer':
             logger.info("Creating SearchEncoderTranslation")
@@ -210,24 +546,28 @@ def get_or_initialize_model(encoder_name: str):
             if model_info['bi_encoder'] is None:
                 logger.info(f"Loading bi-encoder: {encoder_name}")
                 try:
-                    model_info['bi_encoder'] = SentenceTransformer(encoder_name)
+                    model_info['bi_encoder'] = load_bi_encoder(encoder_name, INFERENCE_BACKEND)
                 except Exception as e:
                     raise HTTPException(status_code=500, detail=f"Failed to load bi-encoder {encoder_name}: {str(e)}")
+                residency.register((encoder_name, 'bi_encoder'), model_nbytes(model_info['bi_encoder']), lambda: evict_component(encoder_name, 'bi_encoder'))
 
             # Initialize the cross-encoder if needed
             if model_info['cross_encoder'] is None and model_info['cross_encoder_name']:
                 logger.info(f"Loading cross-encoder: {model_info['cross_encoder_name']}")
                 try:
-                    model_info['cross_encoder'] = CrossEncoder(model_info['cross_encoder_name'])
+                    model_info['cross_encoder'] = load_cross_encoder(model_info['cross_encoder_name'], INFERENCE_BACKEND)
+                    residency.register((encoder_name, 'cross_encoder'), model_nbytes(model_info['cross_encoder']), lambda: evict_component(encoder_name, 'cross_encoder'))
                 except Exception as e:
                     logger.warning(f"Failed to load cross-encoder {model_info['cross_encoder_name']}: {str(e)}")
                     # Don't raise exception here, we can still use bi-encoder only
 
             model = SearchEncoderTranslation(
-                bi_encoder=model_info['bi_encoder'],
+                bi_encoder=get_batching_bi_encoder(model_info),
                 cross_encoder=model_info['cross_encoder'],
-                embedding_korpus=embeddings,
-                korpus=daftar_string_hanya_terjemahan
+                embedding_korpus=model_info['index'],
+                korpus=daftar_string_hanya_terjemahan,
+                encoder_name=encoder_name,
+                query_cache=query_embedding_cache
             )
 
             # Initialize rank encoder if cross encoder is available
@@ -235,9 +575,11 @@ def get_or_initialize_model(encoder_name: str):
                 try:
                     model.rank_encoder = RankEncoderTranslation(
                         bi_encoder=model_info['bi_encoder'],
-                        cross_encoder=model_info['cross_encoder'],
+                        cross_encoder=get_batching_cross_encoder(model_info),
                         embedding_korpus=embeddings,
-                        daftar_string_terjemahan_quran=daftar_string_terjemahan_quran
+                        daftar_string_terjemahan_quran=daftar_string_terjemahan_quran,
+                        cross_encoder_name=model_info['cross_encoder_name'],
+                        score_cache=cross_encoder_score_cache
                     )
                     logger.info("Successfully initialized rank encoder")
                 except Exception as e:
@@ -251,8 +593,9 @@ def get_or_initialize_model(encoder_name: str):
             logger.info("Creating OpenAISearchEncoder")
             model = OpenAISearchEncoder(
                 client=openai_client,
-                embedding_korpus=embeddings,
-                daftar_string_terjemahan_quran=daftar_string_terjemahan_quran
+                embedding_korpus=model_info['index'],
+                daftar_string_terjemahan_quran=daftar_string_terjemahan_quran,
+                query_cache=query_embedding_cache
             )
             # Initialize rank encoder
             try:
@@ -275,13 +618,12 @@ def get_or_initialize_model(encoder_name: str):
             raise HTTPException(status_code=400, detail=f"Unsupported encoder type: {model_info['type']}")
 
         encoders[encoder_name] = model
+        invalidate_encoder_caches(encoder_name)
         return model
 
     except Exception as e:
         logger.error(f"Error initializing encoder {encoder_name}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to initialize encoder {encoder_name}: {str(e)}")
-    finally:
-        lock.release()
 
 # Initialize global variables
 cached_gold_questions = None
@@ -316,119 +658,57 @@ def load_gold_questions():
     cached_gold_questions = gold_questions
     return gold_questions
 
-def normalize_text(text: str) -> str:
-    # Convert to lowercase
-    text = text.lower()
-    # Remove punctuation
-    text = ''.join(c for c in text if c.isalnum() or c.isspace())
-    # Normalize whitespace
-    text = ' '.join(text.split())
-    return text
-
-def calculate_relevancy(query: str, gold_questions: Dict[str, str]) -> tuple[Dict[str, float], List[Dict[str, Any]]]:
-    relevancy_scores = {"high": 0.0, "medium": 0.0, "low": 0.0}
-    related_questions = []
-    
-    if not gold_questions:
-        relevancy_scores["medium"] = 1.0
-        return relevancy_scores, related_questions
+# Task-A questions with their translations/paraphrases, indexed once for related-question lookup.
+# RELATED_QUESTIONS_INDEX: exact (inverted index, exact Jaccard), minhash (MinHash/LSH estimate)
+# or minhash-exact (LSH candidates, exact Jaccard rerank)
+RELATED_QUESTIONS_INDEX = os.getenv('RELATED_QUESTIONS_INDEX', 'exact').lower()
+MINHASH_NUM_PERM = int(os.getenv('MINHASH_NUM_PERM', '128'))
+MINHASH_BANDS = int(os.getenv('MINHASH_BANDS', '32'))
+gold_question_store = None
+gold_question_store_lock = Lock()
+
+def get_gold_question_store() -> GoldQuestionStore:
+    global gold_question_store
+    if gold_question_store is None:
+        with gold_question_store_lock:
+            if gold_question_store is None:
+                translations, paraphrases = load_question_variants(os.path.join(current_dir, '..', 'quran_data'))
+                gold_question_store = GoldQuestionStore(
+                    load_gold_questions(), translations, paraphrases,
+                    index=RELATED_QUESTIONS_INDEX, num_perm=MINHASH_NUM_PERM, bands=MINHASH_BANDS
+                )
+                logger.info(f"Indexed {len(gold_question_store)} gold questions, {len(gold_question_store.text_qids)} translations/paraphrases ({RELATED_QUESTIONS_INDEX})")
+    return gold_question_store
 
-    # Load translations and paraphrases with error handling
-    translations_data = {}
-    paraphrases_data = {}
-    
-    # Helper function to safely load JSONL files
-    def safe_load_jsonl(file_path: str) -> List[Dict]:
+def calculate_relevancy(query: str, gold_questions: GoldQuestionStore) -> tuple[Dict[str, float], List[Dict[str, Any]]]:
+    return gold_questions.relevancy(query)
+
+# Startup warmup: the encoders in WARMUP_ENCODERS are built and run end to end once
+# (encode, retrieval, rerank, relevancy) before /ready reports the replica as ready
+WARMUP_ENCODERS = [name.strip() for name in os.getenv('WARMUP_ENCODERS', '').split(',') if name.strip()]
+WARMUP_QUERY = os.getenv('WARMUP_QUERY', 'bagaimana cara sholat')
+warmup_state = {'done': False, 'encoders': {}}
+
+def warmup_encoders(encoder_names: List[str]):
+    try:
+        calculate_relevancy(WARMUP_QUERY, get_gold_question_store())
+    except Exception as e:
+        logger.warning(f"Relevancy warmup failed: {e}")
+
+    # Build all of them in parallel, then exercise them one by one
+    preload_encoders(encoder_names)
+    for encoder_name in encoder_names:
+        start = time.time()
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return [json.loads(line) for line in f if line.strip()]
+            with residency.pinned(encoder_components(encoder_name)):
+                model = get_or_initialize_model(encoder_name)
+                model.search(WARMUP_QUERY, 5)
+            warmup_state['encoders'][encoder_name] = {'status': 'ok', 'seconds': round(time.time() - start, 2)}
+            logger.info(f"Warmed up {encoder_name} in {time.time() - start:.2f}s")
         except Exception as e:
-            logger.warning(f"Error loading {file_path}: {e}")
-            return []
-
-    # Load all translation files
-    for dataset in ['dev', 'test', 'train']:
-        file_path = os.path.join(current_dir, '..', 'quran_data', f'terjemahan_pertanyaan_claude_{dataset}_id.jsonl')
-        translations = safe_load_jsonl(file_path)
-        for item in translations:
-            if 'qid' in item and 'query_id' in item:
-                qid = str(item['qid'])
-                if qid not in translations_data:
-                    translations_data[qid] = []
-                translations_data[qid].append(item['query_id'])
-
-    # Load all paraphrase files
-    for dataset in ['dev', 'test', 'train']:
-        file_path = os.path.join(current_dir, '..', 'quran_data', f'parafrasa_pertanyaan_gpt_{dataset}_id.jsonl')
-        paraphrases = safe_load_jsonl(file_path)
-        for item in paraphrases:
-            if 'qid' in item and 'query_versions' in item:
-                qid = str(item['qid'])
-                if qid not in paraphrases_data:
-                    paraphrases_data[qid] = []
-                paraphrases_data[qid].extend(item['query_versions'])
-
-    # Calculate similarities using translations and paraphrases
-    similarities = []
-    query_normalized = normalize_text(query)
-    
-    for qid, question in gold_questions.items():
-        qid = str(qid)
-        max_similarity = 0.0
-        
-        # Check translations
-        translations = translations_data.get(qid, [])
-        for translation in translations:
-            translation_normalized = normalize_text(translation)
-            similarity = len(set(query_normalized.split()) & set(translation_normalized.split())) / \
-                        len(set(query_normalized.split()) | set(translation_normalized.split()))
-            max_similarity = max(max_similarity, similarity)
-        
-        # Check paraphrases
-        paraphrases = paraphrases_data.get(qid, [])
-        for paraphrase in paraphrases:
-            paraphrase_normalized = normalize_text(paraphrase)
-            similarity = len(set(query_normalized.split()) & set(paraphrase_normalized.split())) / \
-                        len(set(query_normalized.split()) | set(paraphrase_normalized.split()))
-            max_similarity = max(max_similarity, similarity)
-        
-        if max_similarity > 0:
-            similarities.append((max_similarity, qid, question))
-    
-    # Sort by similarity score
-    similarities.sort(reverse=True)
-    
-    # Get top 5 similar questions
-    top_5 = similarities[:5]
-    
-    # Calculate relevancy metrics
-    if top_5:
-        max_sim = top_5[0][0]
-        if max_sim >= 0.6:
-            relevancy_scores["high"] = 0.7
-            relevancy_scores["medium"] = 0.2
-            relevancy_scores["low"] = 0.1
-        elif max_sim >= 0.3:
-            relevancy_scores["high"] = 0.3
-            relevancy_scores["medium"] = 0.5
-            relevancy_scores["low"] = 0.2
-        else:
-            relevancy_scores["high"] = 0.1
-            relevancy_scores["medium"] = 0.3
-            relevancy_scores["low"] = 0.6
-    
-    # Add related questions with translations and paraphrases
-    for sim, qid, question in top_5:
-        related_questions.append({
-            "qid": qid,
-            "question": question,
-            "similarity": float(sim),
-            "translations": translations_data.get(qid, []),
-            "paraphrases": paraphrases_data.get(qid, []),
-            "arabic_question": question  # Keep the Arabic question for display
-        })
-    
-    return relevancy_scores, related_questions
+            logger.error(f"Warmup failed for {encoder_name}: {e}")
+            warmup_state['encoders'][encoder_name] = {'status': 'error', 'error': str(e)}
+    warmup_state['done'] = True
 
 @app.get("/")
 async def health_check():
@@ -438,74 +718,179 @@ async def health_check():
         "service": "quran-search-rank"
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 503 until the startup warmup has finished, and for good if a warmup encoder failed"""
+    failed = [name for name, state in warmup_state['encoders'].items() if state['status'] != 'ok']
+    if not warmup_state['done']:
+        status = "warming_up"
+    elif failed:
+        status = "failed"
+    else:
+        status = "ready"
+    content = {
+        "status": status,
+        "encoders": warmup_state['encoders']
+    }
+    return JSONResponse(status_code=200 if status == "ready" else 503, content=content)
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss counters of the in-process caches, executor queue depths, inference workers and resident models"""
+    return {
+        "query_embeddings": query_embedding_cache.stats(),
+        "search_responses": search_response_cache.stats(),
+        "cross_encoder_scores": cross_encoder_score_cache.stats(),
+        "executors": {
+            "inference": inference_executor.stats(),
+            "io": io_executor.stats(),
+            "relevancy": relevancy_executor.stats()
+        },
+        "model_server": model_server.stats() if model_server is not None else None,
+        "residency": residency.stats()
+    }
+
+# GET /api/verses limits: verses per response and how long clients/CDNs may cache them
+MAX_VERSES_PER_REQUEST = int(os.getenv('MAX_VERSES_PER_REQUEST', '1000'))
+VERSES_CACHE_MAX_AGE = int(os.getenv('VERSES_CACHE_MAX_AGE', '86400'))
+
+@app.get("/api/verses", response_model=QuranVersesResponse)
+async def get_verses(ids: str, request: Request):
+    """Verses by id, range or whole surah, e.g. ?ids=2:255-257,1,3:7, straight from the verse index"""
+    try:
+        ranges = parse_verse_ranges(ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows, seen, missing = [], set(), []
+    for surah, first, last in ranges:
+        resolved = verse_index.resolve(surah, first, last)
+        if not resolved:
+            missing.append(str(surah) if first is None else f"{surah}:{first}" if first == last else f"{surah}:{first}-{last}")
+        for row in resolved:
+            if row not in seen:
+                seen.add(row)
+                rows.append(row)
+        if len(rows) > MAX_VERSES_PER_REQUEST:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_VERSES_PER_REQUEST} verses per request")
+
+    # The response only depends on the corpus and the resolved rows
+    etag_source = f"{corpus_checksum_current}|{','.join(map(str, rows))}|{','.join(missing)}"
+    etag = '"' + hashlib.sha256(etag_source.encode('utf-8')).hexdigest()[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={VERSES_CACHE_MAX_AGE}"}
+    if_none_match = request.headers.get('if-none-match', '')
+    if any(tag.strip().removeprefix('W/') in (etag, '*') for tag in if_none_match.split(',')):
+        return Response(status_code=304, headers=headers)
+
+    verses = []
+    for row in rows:
+        record = daftar_string_terjemahan_quran[row]
+        surah, ayah = int(record['sura']), int(record['aya'])
+        verses.append(QuranVerse(
+            verse_id=f"{surah}:{ayah}",
+            sura=surah,
+            aya=ayah,
+            arabic_text=record.get('arabic_text', ''),
+            translation=record.get('translation', '')
+        ))
+    content = QuranVersesResponse(verses=verses, missing=missing)
+    return JSONResponse(content=content.model_dump(), headers=headers)
+
 @app.post("/api/search", response_model=QuranSearchResponse)
 async def search_quran(request: QuranSearchRequest):
     start_time = time.time()
     logger.info(f"Received search request - Query: {request.query}, Type: {request.search_type}, Encoder: {request.encoder}")
     
+    cache_key = (request.encoder, request.search_type, request.top_k, request.include_relevancy, request.query)
+    cached_response = search_response_cache.get(cache_key)
+    if cached_response is not None:
+        return cached_response.model_copy(update={"processing_time": time.time() - start_time})
+    
+    async def retrieve() -> QuranSearchResponse:
+        if request.search_type == 'verse':
+            return run_verse_lookup(request, start_time)
+        await wait_for_model_initialization(request.encoder)
+        return await executor_for(request.encoder).run(run_search, request, start_time)
+
+    # Relevancy scoring does not depend on the encoder, so it runs alongside model loading and search
+    stages = [retrieve()]
+    if request.include_relevancy:
+        stages.append(relevancy_executor.run(run_relevancy, request.query))
+    outcomes = await asyncio.gather(*stages, return_exceptions=True)
+    for outcome in outcomes:
+        if isinstance(outcome, ExecutorSaturatedError):
+            logger.warning(f"Rejecting search request: {outcome}")
+            raise HTTPException(status_code=503, detail="Server is busy, please retry")
+        if isinstance(outcome, BaseException):
+            raise outcome
+
+    response = outcomes[0]
+    if request.include_relevancy:
+        relevancy_scores, related_questions = outcomes[1]
+        attach_relevancy(response, relevancy_scores, related_questions)
+    response.processing_time = time.time() - start_time
+    search_response_cache.set(cache_key, response)
+    return response
+
+def run_relevancy(query: str) -> tuple[Dict[str, float], List[Dict[str, Any]]]:
+    """Relevancy metrics and related questions for a query, run on the relevancy executor"""
+    try:
+        # Gold standard questions, loaded and indexed once
+        return calculate_relevancy(query, get_gold_question_store())
+    except Exception as e:
+        logger.error(f"Error calculating relevancy: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def attach_relevancy(response: QuranSearchResponse, relevancy_scores: Dict[str, float], related_questions: List[Dict[str, Any]]):
+    response.relevancy_metrics = relevancy_scores
+    response.related_questions = related_questions
+    for result in response.results:
+        result.relevancy_scores = relevancy_scores
+        result.related_questions = related_questions
+
+def run_verse_lookup(request: QuranSearchRequest, start_time: float) -> QuranSearchResponse:
+    """Exact verse for a 'surah:ayah' query, straight from the verse index without any model"""
+    try:
+        surah, ayah = parse_verse_id(request.query)
+    except ValueError as e:
+        logger.error(f"Invalid verse query format: {request.query}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    record = verse_index.get(surah, ayah)
+    if record is None:
+        logger.warning(f"No results found for verse {surah}:{ayah}")
+        results = []
+    else:
+        results = [
+            QuranSearchResult(
+                verse_id=f"{surah}:{ayah}",
+                arabic_text=record.get('arabic_text', ''),
+                translation=record.get('translation', ''),
+                search_score=1.0,
+                rank_score=1.0,
+                final_score=1.0
+            )
+        ]
+
+    return QuranSearchResponse(
+        results=results,
+        query=request.query,
+        search_type='verse',
+        processing_time=time.time() - start_time,
+        encoder=request.encoder
+    )
+
+def run_search(request: QuranSearchRequest, start_time: float) -> QuranSearchResponse:
+    """Blocking part of a search (model init, inference), run on an executor thread; relevancy is attached by the caller"""
+    # The encoder's components stay pinned until the search is done, so residency never evicts them mid-request
+    with residency.pinned(encoder_components(request.encoder)):
+        return search_with_model(request, start_time)
+
+def search_with_model(request: QuranSearchRequest, start_time: float) -> QuranSearchResponse:
     try:
         # Get the appropriate model
         model = get_or_initialize_model(request.encoder)
         
-        # Load gold standard questions
-        gold_questions = load_gold_questions()
-        
-        # Calculate relevancy scores and get related questions
-        relevancy_scores, related_questions = calculate_relevancy(request.query, gold_questions)
-        
-        # Handle verse lookup differently
-        if request.search_type == 'verse':
-            try:
-                # Extract the actual verse ID from the query
-                verse_id = request.query.replace('verse:', '')
-                if ':' not in verse_id:
-                    raise ValueError("Invalid verse ID format")
-                    
-                surah, ayah = verse_id.split(':')
-                logger.info(f"Verse lookup - Surah: {surah}, Ayah: {ayah}")
-                
-                if not surah.isdigit() or not ayah.isdigit():
-                    raise ValueError("Invalid verse ID format")
-                
-                # Use the selected encoder
-                model = get_or_initialize_model(request.encoder)
-                
-                # Search for exact verse
-                verse_results = model.search(f"verse:{verse_id}", request.top_k)
-                logger.info(f"Verse search results: {verse_results}")
-                
-                if not verse_results:
-                    logger.warning(f"No results found for verse {verse_id}")
-                    results = []
-                else:
-                    results = [
-                        QuranSearchResult(
-                            verse_id=verse_id,
-                            arabic_text=verse_results[0].get('arabic_text', ''),
-                            translation=verse_results[0].get('text', ''),
-                            search_score=verse_results[0].get('map_score', verse_results[0].get('score', 1.0)),
-                            rank_score=verse_results[0].get('mrr_score', verse_results[0].get('cross-score', 1.0)),
-                            final_score=verse_results[0].get('final_score', 1.0),
-                            relevancy_scores=relevancy_scores,
-                            related_questions=related_questions
-                        )
-                    ]
-                    logger.info(f"Created verse result with verse_id: {verse_id}")
-                
-                return QuranSearchResponse(
-                    results=results,
-                    query=request.query,
-                    search_type='verse',
-                    processing_time=time.time() - start_time,
-                    encoder=request.encoder,
-                    relevancy_metrics=relevancy_scores,
-                    related_questions=related_questions
-                )
-                
-            except ValueError as e:
-                logger.error(f"Invalid verse query format: {request.query}")
-                raise HTTPException(status_code=400, detail=str(e))
-        
         # For Ayatec encoder, handle differently
         if ENCODER_MODELS[request.encoder]['type'] == "ayatec":
             ayatec_results = model.search(request.query, request.top_k)
@@ -520,9 +905,7 @@ async def search_quran(request: QuranSearchRequest):
                     search_score=res["similarity_score"],
                     rank_score=1.0,
                     final_score=res["similarity_score"],
-                    ayatec_match=res["ayatec_match"],
-                    relevancy_scores=relevancy_scores,
-                    related_questions=related_questions
+                    ayatec_match=res["ayatec_match"]
                 ))
         else:
             # Handle normal search
@@ -545,9 +928,7 @@ async def search_quran(request: QuranSearchRequest):
                         translation=hit.get('text', daftar_string_terjemahan_quran[hit['corpus_id']]),
                         search_score=float(search_score),
                         rank_score=float(rank_score),
-                        final_score=float(final_score),
-                        relevancy_scores=relevancy_scores,
-                        related_questions=related_questions
+                        final_score=float(final_score)
                     ))
                     seen_docs.add(doc_id)
             
@@ -556,22 +937,37 @@ async def search_quran(request: QuranSearchRequest):
             query=request.query,
             search_type=request.search_type,
             processing_time=time.time() - start_time,
-            encoder=request.encoder,
-            relevancy_metrics=relevancy_scores,
-            related_questions=related_questions
+            encoder=request.encoder
         )
         
     except Exception as e:
         logger.error(f"Error processing search request: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.on_event("startup")
+async def startup_event():
+    if INFERENCE_WORKERS > 0:
+        start_model_server()
+    preload_encoders(PRELOAD_ENCODERS)
+    # Warm up in the background so the liveness check at / answers meanwhile
+    Thread(target=warmup_encoders, args=(WARMUP_ENCODERS,), name='warmup', daemon=True).start()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     # Clean up resources
-    global encoders, encoder_locks, model_cache
+    global encoders, init_futures, model_cache
     encoders.clear()
-    encoder_locks.clear()
+    init_futures.clear()
     model_cache.clear()
+    search_response_cache.clear()
+    query_embedding_cache.clear()
+    cross_encoder_score_cache.clear()
+    inference_executor.shutdown()
+    init_executor.shutdown()
+    io_executor.shutdown()
+    relevancy_executor.shutdown()
+    if model_server is not None:
+        model_server.shutdown()
     
     # Clean up any temporary files
     cache_dir = os.path.join(os.path.dirname(__file__), "model_cache")
@@ -1,9 +1,9 @@
 import os
-import pickle
 from sentence_transformers import SentenceTransformer
 from sentence_transformers import CrossEncoder
 import logging
 from pathlib import Path
+from quran_model.embedding_store import load_embeddings
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -12,35 +12,33 @@ logger = logging.getLogger(__name__)
 # Model configurations
 ENCODER_MODELS = {
     'firqaaa/indo-sentence-bert-base': {
-        'embedding_file': 'embedding_korpus_1.pkl',
+        'embedding_file': 'embedding_korpus_1.npy',
         'cross_encoder': 'Rifky/Indobert-QA'
     },
     'indobenchmark/indobert-base-p1': {
-        'embedding_file': 'embedding_korpus_2.pkl',
+        'embedding_file': 'embedding_korpus_2.npy',
         'cross_encoder': 'indobenchmark/indobert-base-p2'
     },
     'msmarco-distilbert-base-tas-b': {
-        'embedding_file': 'embedding_korpus_3.pkl',
+        'embedding_file': 'embedding_korpus_3.npy',
         'cross_encoder': 'cross-encoder/ms-marco-MiniLM-L-6-v2'
     },
     'aubmindlab/bert-base-arabert': {
-        'embedding_file': 'embedding_korpus_4.pkl',
+        'embedding_file': 'embedding_korpus_4.npy',
         'cross_encoder': 'aubmindlab/araelectra-base-discriminator'
     }
 }
 
-def verify_pkl_file(file_path: str) -> bool:
-    """Verify if a pickle file exists and can be loaded"""
+def verify_embedding_file(file_path: str) -> bool:
+    """Verify if an embedding file (.npy or legacy .pkl) exists and can be loaded"""
     try:
-        if not os.path.exists(file_path):
-            logger.error(f"Embedding file not found: {file_path}")
-            return False
-            
-        with open(file_path, 'rb') as f:
-            embeddings = pickle.load(f)
-            logger.info(f"Successfully loaded embeddings from {file_path}")
-            logger.info(f"Embeddings shape/size: {len(embeddings) if isinstance(embeddings, list) else embeddings.shape}")
+        embeddings = load_embeddings(file_path)
+        logger.info(f"Successfully loaded embeddings from {file_path}")
+        logger.info(f"Embeddings shape/size: {embeddings.shape}")
         return True
+    except FileNotFoundError:
+        logger.error(f"Embedding file not found: {file_path}")
+        return False
     except Exception as e:
         logger.error(f"Error loading {file_path}: {e}")
         return False
@@ -84,7 +82,7 @@ def main():
 
         # 3. Verify embedding file
         embedding_path = current_dir / config['embedding_file']
-        if verify_pkl_file(str(embedding_path)):
+        if verify_embedding_file(str(embedding_path)):
             status["embeddings"][config['embedding_file']] = "✓"
         else:
             status["embeddings"][config['embedding_file']] = "✗"
@@ -0,0 +1,96 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def parse_verse_id(verse_id: str) -> Tuple[int, int]:
+    """'2:255' or 'verse:2:255' -> (2, 255); ValueError on anything else"""
+    verse_id = verse_id.strip()
+    if verse_id.startswith('verse:'):
+        verse_id = verse_id[len('verse:'):]
+    surah, sep, ayah = verse_id.partition(':')
+    surah, ayah = surah.strip(), ayah.strip()
+    if not sep or not surah.isdigit() or not ayah.isdigit():
+        raise ValueError("Invalid verse ID format")
+    return int(surah), int(ayah)
+
+def parse_verse_ranges(ids: str) -> List[Tuple[int, Optional[int], Optional[int]]]:
+    """'2:255-257,1,3:7' -> [(2, 255, 257), (1, None, None), (3, 7, 7)]; a bare surah means all of it.
+
+    Ranges use the nomor_dokumen format of the Thematic QPC TSV. ValueError on anything else.
+    """
+    ranges = []
+    for part in ids.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        surah, sep, ayahs = part.partition(':')
+        surah = surah.strip()
+        if not surah.isdigit():
+            raise ValueError(f"Invalid verse range: {part}")
+        if not sep:
+            ranges.append((int(surah), None, None))
+            continue
+        first, dash, last = ayahs.partition('-')
+        first, last = first.strip(), (last.strip() if dash else first.strip())
+        if not first.isdigit() or not last.isdigit() or int(first) > int(last):
+            raise ValueError(f"Invalid verse range: {part}")
+        ranges.append((int(surah), int(first), int(last)))
+    if not ranges:
+        raise ValueError("No verse ids given")
+    return ranges
+
+class VerseIndex:
+    """Maps (sura, aya) to the row of the verse in the structured translation records.
+
+    Built once from the records loaded from quran_terjemahan_sabiq.jsonl, so
+    a verse lookup is a dict access instead of a model search. For ranges it
+    also keeps a per-surah offset table (first row, verse count), which turns
+    ayahs a..b of a surah into a slice of rows when the surah is stored
+    contiguously in ayah order, as the QuranEnc export is.
+    """
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.records = records
+        self.rows: Dict[Tuple[int, int], int] = {}
+        skipped = 0
+        for row, record in enumerate(records):
+            try:
+                key = (int(record['sura']), int(record['aya']))
+            except (KeyError, TypeError, ValueError):
+                skipped += 1
+                continue
+            self.rows.setdefault(key, row)
+        if skipped:
+            logger.warning(f"Verse index skipped {skipped} records without a valid sura/aya")
+
+        self.surah_sizes: Dict[int, int] = {}
+        for surah, ayah in self.rows:
+            self.surah_sizes[surah] = max(self.surah_sizes.get(surah, 0), ayah)
+        self.surah_offsets: Dict[int, Tuple[int, int]] = {}
+        for surah, size in self.surah_sizes.items():
+            first = self.rows.get((surah, 1))
+            if first is not None and all(self.rows.get((surah, ayah)) == first + ayah - 1 for ayah in range(1, size + 1)):
+                self.surah_offsets[surah] = (first, size)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def row(self, surah: int, ayah: int) -> Optional[int]:
+        return self.rows.get((surah, ayah))
+
+    def resolve(self, surah: int, first: Optional[int] = None, last: Optional[int] = None) -> List[int]:
+        """Rows of ayahs first..last of a surah (the whole surah when omitted); ayahs that do not exist are skipped"""
+        size = self.surah_sizes.get(surah, 0)
+        first = max(first or 1, 1)
+        last = min(last if last is not None else size, size)
+        if first > last:
+            return []
+        offset = self.surah_offsets.get(surah)
+        if offset is not None:
+            return list(range(offset[0] + first - 1, offset[0] + last))
+        return [self.rows[(surah, ayah)] for ayah in range(first, last + 1) if (surah, ayah) in self.rows]
+
+    def get(self, surah: int, ayah: int) -> Optional[Dict[str, Any]]:
+        row = self.rows.get((surah, ayah))
+        return self.records[row] if row is not None else None